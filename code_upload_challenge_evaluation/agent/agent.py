@@ -2,37 +2,63 @@ import evaluation_pb2
 import evaluation_pb2_grpc
 import grpc
 import os
-import pickle
-import time
+import queue
 
-time.sleep(30)
+from wire_format import pack_action, pack_actions, unpack_step, unpack_steps
 
 LOCAL_EVALUATION = os.environ.get("LOCAL_EVALUATION")
+# Seconds to wait for the environment to accept connections
+CONNECT_TIMEOUT = float(os.environ.get("CONNECT_TIMEOUT", 300))
 
 if LOCAL_EVALUATION:
     channel = grpc.insecure_channel("environment:8085")
 else:
     channel = grpc.insecure_channel("localhost:8085")
 
-stub = evaluation_pb2_grpc.EnvironmentStub(channel)
-
-
-def pack_for_grpc(entity):
-    return pickle.dumps(entity)
+# The environment registers its servicer before it starts listening, so it
+# serves as soon as the channel connects. Until then the channel keeps
+# reconnecting with backoff.
+grpc.channel_ready_future(channel).result(timeout=CONNECT_TIMEOUT)
 
+stub = evaluation_pb2_grpc.EnvironmentStub(channel)
 
-def unpack_for_grpc(entity):
-    return pickle.loads(entity)
+# Session of this agent on an environment that serves several agents
+SESSION_ID = os.environ.get("SESSION_ID")
+metadata = (("session-id", SESSION_ID),) if SESSION_ID else None
 
 
-flag = None
+num_environments = stub.get_action_space(
+    evaluation_pb2.Package(), metadata=metadata
+).num_environments
 
-while not flag:
-    base = unpack_for_grpc(
-        stub.act_on_environment(
-            evaluation_pb2.Package(SerializedEntity=pack_for_grpc(1))
-        ).SerializedEntity
+if num_environments > 1:
+    # A vectorized environment takes one action per copy in every call and
+    # answers with the stacked feedback of the copies
+    flag = False
+    while not flag:
+        base = unpack_steps(
+            stub.act_on_environments(
+                pack_actions([1] * num_environments), metadata=metadata
+            )
+        )
+        flag = base["feedback"][2].all()
+        print("Agent Feedback", base["feedback"])
+        print("*" * 100)
+else:
+    # Actions go out over one long-lived streaming call, every response is the
+    # feedback of one step. `stub.act_on_environment` steps with one call each.
+    actions = queue.Queue()
+    responses = stub.act_on_environment_stream(
+        iter(actions.get, None), metadata=metadata
     )
-    flag = base["feedback"][2]
-    print("Agent Feedback", base["feedback"])
-    print("*" * 100)
+    actions.put(pack_action(1))
+
+    for response in responses:
+        base = unpack_step(response)
+        flag = base["feedback"][2]
+        print("Agent Feedback", base["feedback"])
+        print("*" * 100)
+        if flag:
+            actions.put(None)
+            break
+        actions.put(pack_action(1))
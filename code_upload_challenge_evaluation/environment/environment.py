@@ -1,10 +1,10 @@
 import grpc
 import gym
-import pickle
 import sys
 import os
 import requests
 import json
+import threading
 
 from environment_utils import EvalAI_Interface
 
@@ -13,9 +13,35 @@ import time
 
 import evaluation_pb2
 import evaluation_pb2_grpc
+from wire_format import (
+    pack_action_space,
+    pack_step,
+    pack_steps,
+    unpack_action,
+    unpack_actions,
+)
 
 LOCAL_EVALUATION = os.environ.get("LOCAL_EVALUATION")
-EVALUATION_COMPLETED = False
+# Set once the results of the evaluation are reported, which stops the server
+EVALUATION_COMPLETED = threading.Event()
+# Copies of the environment, more than one serves `act_on_environments` only
+NUM_ENVIRONMENTS = int(os.environ.get("NUM_ENVIRONMENTS", 1))
+# Seed of the first copy of a vectorized environment, the next copies get the
+# following seeds
+ENVIRONMENT_SEED = os.environ.get("ENVIRONMENT_SEED")
+# Serve the sessions of many agents, keyed by the "session-id" metadata, at
+# once. The host lists the session ids and their submissions in the
+# "sessions" of BODY, or in SESSIONS for a local evaluation.
+MULTI_TENANT = os.environ.get("MULTI_TENANT")
+# Sessions evaluated at the same time, each one may hold a server thread
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", 16)) if MULTI_TENANT else 1
+# Seconds after which a session without calls is dropped
+SESSION_TIMEOUT = float(os.environ.get("SESSION_TIMEOUT", 3600))
+# Seconds the calls in progress get to finish once the evaluation completes
+STOP_GRACE = 5
+# Attempts to report a result within one call, before the call fails
+REPORT_ATTEMPTS = 3
+REPORT_BACKOFF = 1.0
 
 
 class evaluator_environment:
@@ -32,54 +58,250 @@ class evaluator_environment:
         self.score += 1
 
 
+class evaluator_environments:
+    def __init__(self, num_environments, environment="CartPole-v0", seed=None):
+        """Independent copies of an environment stepped together
+
+        Every copy plays one episode and the score is the mean score of the
+        copies, so an evaluation averages over many seeds in about the time
+        of one episode.
+
+        Args:
+            num_environments ([int]): Copies of the environment
+            environment ([str], optional): Gym id. Defaults to "CartPole-v0".
+            seed ([int], optional): Seed of the first copy, the others get the
+                following seeds. Defaults to unseeded copies.
+        """
+        self.envs = [
+            evaluator_environment(environment) for _ in range(num_environments)
+        ]
+        if seed is not None:
+            for offset, copy in enumerate(self.envs):
+                copy.env.seed(seed + offset)
+                copy.env.reset()
+        self.score = 0
+        self.done = False
+
+    def get_action_space(self):
+        return self.envs[0].get_action_space()
+
+    def step(self, actions):
+        """Step every copy whose episode is not over with its action
+
+        Args:
+            actions ([np.ndarray]): One action per copy
+        """
+        for copy, action in zip(self.envs, actions):
+            if not copy.feedback or not copy.feedback[2]:
+                copy.next_score()
+                copy.feedback = copy.env.step(action)
+        self.score = sum(copy.score for copy in self.envs) / len(self.envs)
+        self.done = all(copy.feedback[2] for copy in self.envs)
+
+
+def make_environment():
+    if NUM_ENVIRONMENTS > 1:
+        return evaluator_environments(
+            NUM_ENVIRONMENTS,
+            seed=int(ENVIRONMENT_SEED) if ENVIRONMENT_SEED is not None else None,
+        )
+    return evaluator_environment()
+
+
+class Session:
+    def __init__(self, challenge_pk, phase_pk, submission_pk):
+        """Environment, score and completion state of one agent
+
+        Args:
+            challenge_pk ([str]): Primary key of the challenge
+            phase_pk ([str]): Primary key of the challenge phase
+            submission_pk ([str]): Submission the result is reported to
+        """
+        self.challenge_pk = challenge_pk
+        self.phase_pk = phase_pk
+        self.submission_pk = submission_pk
+        self.env = make_environment()
+        self.completed = False
+        # Calls of one agent may overlap, e.g. a stream and a unary call
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class Sessions:
+    def __init__(self, challenge_pk, phase_pk, submission_pk, allowed=None):
+        """Sessions of the agents served by this environment, by session id
+
+        Without `MULTI_TENANT` there is one session, evaluated for
+        `submission_pk`. Otherwise the session id is the "session-id"
+        metadata of a call and only the ids of `allowed` exist, each
+        evaluated for the submission the host assigned to it. An agent can
+        therefore neither pick the submission it is scored for nor step the
+        session of another agent, as long as the ids are kept secret.
+
+        Args:
+            challenge_pk ([str]): Primary key of the challenge
+            phase_pk ([str]): Primary key of the challenge phase
+            submission_pk ([str]): Submission of the single session
+            allowed ([dict], optional): Submission primary key by session id
+                with `MULTI_TENANT`. Defaults to no sessions.
+        """
+        self.challenge_pk = challenge_pk
+        self.phase_pk = phase_pk
+        self.submission_pk = submission_pk
+        self.allowed = allowed or {}
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+    def get(self, context):
+        """Session of a call, created on its first call
+
+        Args:
+            context ([grpc.ServicerContext]): Context of the call
+
+        Returns:
+            [Session]: The session
+        """
+        session_id = ""
+        submission_pk = self.submission_pk
+        if MULTI_TENANT:
+            session_id = dict(context.invocation_metadata()).get("session-id", "")
+            if session_id not in self.allowed:
+                context.abort(grpc.StatusCode.PERMISSION_DENIED, "Unknown session")
+            submission_pk = self.allowed[session_id]
+        with self.lock:
+            now = time.monotonic()
+            # Completed sessions stay, so their submissions are not evaluated
+            # again by a later call
+            for key, session in list(self.sessions.items()):
+                if not session.completed and now - session.last_used > SESSION_TIMEOUT:
+                    del self.sessions[key]
+            session = self.sessions.get(session_id)
+            if session is None:
+                running = sum(
+                    not session.completed for session in self.sessions.values()
+                )
+                if running >= MAX_SESSIONS:
+                    context.abort(
+                        grpc.StatusCode.RESOURCE_EXHAUSTED,
+                        "{} sessions are running already".format(running),
+                    )
+                session = self.sessions[session_id] = Session(
+                    self.challenge_pk, self.phase_pk, submission_pk
+                )
+            session.last_used = now
+        return session
+
+    def all_completed(self):
+        """Whether every session the host listed has completed"""
+        with self.lock:
+            return all(
+                session_id in self.sessions and self.sessions[session_id].completed
+                for session_id in self.allowed
+            )
+
+
 class Environment(evaluation_pb2_grpc.EnvironmentServicer):
-    def __init__(self, challenge_pk, phase_pk, submission_pk, server):
+    def __init__(self, challenge_pk, phase_pk, submission_pk, server, sessions=None):
         self.challenge_pk = challenge_pk
         self.phase_pk = phase_pk
         self.submission_pk = submission_pk
         self.server = server
+        self.sessions = Sessions(challenge_pk, phase_pk, submission_pk, sessions)
 
     def get_action_space(self, request, context):
-        message = pack_for_grpc(env.get_action_space())
-        return evaluation_pb2.Package(SerializedEntity=message)
+        session = self.sessions.get(context)
+        return pack_action_space(
+            session.env.get_action_space(), num_environments=NUM_ENVIRONMENTS
+        )
 
     def act_on_environment(self, request, context):
-        global EVALUATION_COMPLETED
-        if not env.feedback or not env.feedback[2]:
-            action = unpack_for_grpc(request.SerializedEntity)
-            env.next_score()
-            env.feedback = env.env.step(action)
-        if env.feedback[2]:
-            if not LOCAL_EVALUATION:
-                update_submission_result(
-                    env, self.challenge_pk, self.phase_pk, self.submission_pk
-                )
-            else:
-                print("Final Score: {0}".format(env.score))
-                print("Stopping Evaluation!")
-                EVALUATION_COMPLETED = True
-        return evaluation_pb2.Package(
-            SerializedEntity=pack_for_grpc(
-                {"feedback": env.feedback, "current_score": env.score,}
+        if NUM_ENVIRONMENTS > 1:
+            context.abort(
+                grpc.StatusCode.FAILED_PRECONDITION,
+                "The environment is vectorized, use act_on_environments",
             )
-        )
+        session = self.sessions.get(context)
+        env = session.env
+        with session.lock:
+            if not env.feedback or not env.feedback[2]:
+                try:
+                    action = unpack_action(request)
+                except ValueError as error:
+                    context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(error))
+                env.next_score()
+                env.feedback = env.env.step(action)
+            if env.feedback[2] and not session.completed:
+                self.complete(session, context)
+            return pack_step(env.feedback, env.score)
+
+    def act_on_environment_stream(self, request_iterator, context):
+        # One response per action, without a round trip per step
+        for request in request_iterator:
+            yield self.act_on_environment(request, context)
+
+    def act_on_environments(self, request, context):
+        if NUM_ENVIRONMENTS == 1:
+            context.abort(
+                grpc.StatusCode.FAILED_PRECONDITION,
+                "Set NUM_ENVIRONMENTS to step several copies of the environment",
+            )
+        try:
+            actions = unpack_actions(request)
+        except ValueError as error:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(error))
+        if actions.shape[:1] != (NUM_ENVIRONMENTS,):
+            context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT,
+                "Expected {} actions, got shape {}".format(
+                    NUM_ENVIRONMENTS, actions.shape
+                ),
+            )
+        session = self.sessions.get(context)
+        env = session.env
+        with session.lock:
+            if not env.done:
+                env.step(actions)
+            if env.done and not session.completed:
+                self.complete(session, context)
+            return pack_steps(
+                [copy.feedback for copy in env.envs], [copy.score for copy in env.envs]
+            )
+
+    def complete(self, session, context):
+        # The session only counts as completed once its result is stored, a
+        # failed report is retried by the next call of the session
+        if not LOCAL_EVALUATION:
+            for attempt in range(1, REPORT_ATTEMPTS + 1):
+                try:
+                    update_submission_result(
+                        session.env,
+                        session.challenge_pk,
+                        session.phase_pk,
+                        session.submission_pk,
+                    )
+                    break
+                except Exception as error:
+                    print("Reporting the result failed: {}".format(error))
+                    if attempt == REPORT_ATTEMPTS:
+                        context.abort(
+                            grpc.StatusCode.UNAVAILABLE,
+                            "Reporting the result failed, call again to retry",
+                        )
+                    time.sleep(REPORT_BACKOFF * 2 ** (attempt - 1))
+        else:
+            print("Final Score: {0}".format(session.env.score))
+        session.completed = True
+        if not MULTI_TENANT or self.sessions.all_completed():
+            print("Stopping Evaluation!")
+            EVALUATION_COMPLETED.set()
 
 
-env = evaluator_environment()
 api = EvalAI_Interface(
     AUTH_TOKEN=os.environ.get("AUTH_TOKEN", "x"),
     EVALAI_API_SERVER=os.environ.get("EVALAI_API_SERVER", "http://localhost:8000"),
 )
 
 
-def pack_for_grpc(entity):
-    return pickle.dumps(entity)
-
-
-def unpack_for_grpc(entity):
-    return pickle.loads(entity)
-
-
 def get_action_space(env):
     return list(range(env.action_space.n))
 
@@ -107,8 +329,6 @@ def update_submission_result(env, challenge_pk, phase_pk, submission_pk):
     }
     api.update_submission_data(submission_data, challenge_pk)
     print("Data updated successfully!")
-    EVALUATION_COMPLETED = True
-    exit(0)
 
 
 def main():
@@ -120,23 +340,32 @@ def main():
         BODY = json.loads(BODY)
         challenge_pk = BODY["challenge_pk"]
         phase_pk = BODY["phase_pk"]
-        submission_pk = BODY["submission_pk"]
+        submission_pk = BODY.get("submission_pk")
+        # Submission primary key by session id with MULTI_TENANT, e.g.
+        # "sessions": {"<random session id>": 1352, ...}
+        sessions = BODY.get("sessions")
     else:
         challenge_pk = "1"
         phase_pk = "1"
         submission_pk = "1"
+        sessions = json.loads(os.environ.get("SESSIONS", "{}"))
+    if MULTI_TENANT and not sessions:
+        raise ValueError("MULTI_TENANT needs the session ids of the agents")
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+    # A stream holds its thread for the whole episode, one more thread
+    # keeps the unary calls available meanwhile
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=MAX_SESSIONS + 1))
     evaluation_pb2_grpc.add_EnvironmentServicer_to_server(
-        Environment(challenge_pk, phase_pk, submission_pk, server), server
+        Environment(challenge_pk, phase_pk, submission_pk, server, sessions), server
     )
     print("Starting server. Listening on port 8085.")
     server.add_insecure_port("[::]:8085")
     server.start()
     try:
-        while not EVALUATION_COMPLETED:
-            time.sleep(4)
-        server.stop(0)
+        EVALUATION_COMPLETED.wait()
+        # The grace period lets the call that completed the evaluation send
+        # its final feedback
+        server.stop(STOP_GRACE).wait()
     except KeyboardInterrupt:
         server.stop(0)
 
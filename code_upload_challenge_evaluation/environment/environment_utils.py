@@ -1,16 +1,50 @@
 import logging
+import os
 import requests
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Kept-alive connections to the EvalAI API
+HTTP_POOL_SIZE = int(os.environ.get("EVALAI_HTTP_POOL_SIZE", 4))
+# Transport-level retries of a failed request, with exponential backoff
+HTTP_MAX_RETRIES = int(os.environ.get("EVALAI_HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Updating a submission twice has the same effect as once
+RETRY_METHODS = ("GET", "PUT", "PATCH")
 
 URLS = {
     "update_submission_data": "/api/jobs/challenge/{}/update_submission/",
 }
 
 
+def make_session(pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES):
+    retry_options = dict(
+        total=max_retries,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(allowed_methods=RETRY_METHODS, **retry_options)
+    except TypeError:
+        # urllib3 before 1.26
+        retry = Retry(method_whitelist=RETRY_METHODS, **retry_options)
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class EvalAI_Interface:
-    def __init__(self, AUTH_TOKEN, EVALAI_API_SERVER):
+    def __init__(self, AUTH_TOKEN, EVALAI_API_SERVER, session=None):
         self.AUTH_TOKEN = AUTH_TOKEN
         self.EVALAI_API_SERVER = EVALAI_API_SERVER
+        self.session = session or make_session()
 
     def get_request_headers(self):
         headers = {"Authorization": "Bearer {}".format(self.AUTH_TOKEN)}
@@ -19,7 +53,7 @@ class EvalAI_Interface:
     def make_request(self, url, method, data=None):
         headers = self.get_request_headers()
         try:
-            response = requests.request(
+            response = self.session.request(
                 method=method, url=url, headers=headers, data=data, timeout=200
             )
             response.raise_for_status()
@@ -0,0 +1,107 @@
+"""Steps per second of the unary and the streaming environment RPC
+
+Runs a CartPole environment server in this process and steps it over a
+local channel with both RPCs in both wire formats:
+
+    python benchmark.py [--steps 5000] [--port 8086]
+"""
+
+import argparse
+import queue
+import time
+from concurrent import futures
+
+import grpc
+import gym
+
+import evaluation_pb2_grpc
+from wire_format import WIRE_FORMATS, pack_action, pack_step, unpack_action, unpack_step
+
+
+class BenchmarkEnvironment(evaluation_pb2_grpc.EnvironmentServicer):
+    def __init__(self, environment="CartPole-v0"):
+        """Environment that starts a new episode instead of ending the run
+
+        It answers in the wire format of every request.
+        """
+        self.env = gym.make(environment)
+        self.env.reset()
+        self.score = 0
+
+    def act_on_environment(self, request, context):
+        wire_format = "tensor" if request.HasField("action") else "pickle"
+        feedback = self.env.step(unpack_action(request, allow_pickle=True))
+        self.score += 1
+        if feedback[2]:
+            self.env.reset()
+        return pack_step(feedback, self.score, wire_format)
+
+    def act_on_environment_stream(self, request_iterator, context):
+        for request in request_iterator:
+            yield self.act_on_environment(request, context)
+
+
+def step_unary(stub, steps, wire_format):
+    for _ in range(steps):
+        response = stub.act_on_environment(pack_action(1, wire_format))
+        unpack_step(response, allow_pickle=True)
+
+
+def step_stream(stub, steps, wire_format):
+    actions = queue.Queue()
+    responses = stub.act_on_environment_stream(iter(actions.get, None))
+    actions.put(pack_action(1, wire_format))
+    for step, response in enumerate(responses, 1):
+        unpack_step(response, allow_pickle=True)
+        actions.put(pack_action(1, wire_format) if step < steps else None)
+
+
+def measure(step, stub, steps, wire_format):
+    """Steps per second of one of the `step_*` functions
+
+    Args:
+        step ([callable]): `step_unary` or `step_stream`
+        stub ([EnvironmentStub]): Stub of the server
+        steps ([int]): Steps to take
+        wire_format ([str]): One of `WIRE_FORMATS`
+
+    Returns:
+        [float]: Steps per second
+    """
+    # Warm up the channel and the server threads
+    step(stub, min(steps, 100), wire_format)
+    start = time.perf_counter()
+    step(stub, steps, wire_format)
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8086)
+    args = parser.parse_args()
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    evaluation_pb2_grpc.add_EnvironmentServicer_to_server(
+        BenchmarkEnvironment(), server
+    )
+    server.add_insecure_port("localhost:{}".format(args.port))
+    server.start()
+    try:
+        with grpc.insecure_channel("localhost:{}".format(args.port)) as channel:
+            stub = evaluation_pb2_grpc.EnvironmentStub(channel)
+            for wire_format in WIRE_FORMATS:
+                for name, step in (("unary", step_unary), ("stream", step_stream)):
+                    print(
+                        "{:<8}{:<8}{:>10.0f} steps/s".format(
+                            name,
+                            wire_format,
+                            measure(step, stub, args.steps, wire_format),
+                        )
+                    )
+    finally:
+        server.stop(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,7 +20,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   package='evaluation',
   syntax='proto3',
   serialized_options=None,
-  serialized_pb=_b('\n\x10\x65valuation.proto\x12\nevaluation\"#\n\x07Package\x12\x18\n\x10SerializedEntity\x18\x01 \x01(\x0c\x32\x8f\x01\n\x0b\x45nvironment\x12>\n\x10get_action_space\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x12@\n\x12\x61\x63t_on_environment\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x62\x06proto3')
+  serialized_pb=_b('\n\x10\x65valuation.proto\x12\nevaluation\"\xf2\x01\n\x07Package\x12\x18\n\x10SerializedEntity\x18\x01 \x01(\x0c\x12\"\n\x06\x61\x63tion\x18\x02 \x01(\x0b\x32\x12.evaluation.Tensor\x12(\n\x0c\x61\x63tion_space\x18\x03 \x01(\x0b\x32\x12.evaluation.Tensor\x12\x1e\n\x04step\x18\x04 \x01(\x0b\x32\x10.evaluation.Step\x12#\n\x07\x61\x63tions\x18\x05 \x01(\x0b\x32\x12.evaluation.Tensor\x12 \n\x05steps\x18\x06 \x01(\x0b\x32\x11.evaluation.Steps\x12\x18\n\x10num_environments\x18\x07 \x01(\x03\"4\n\x06Tensor\x12\r\n\x05\x64type\x18\x01 \x01(\t\x12\r\n\x05shape\x18\x02 \x03(\x03\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\"r\n\x04Step\x12\'\n\x0bobservation\x18\x01 \x01(\x0b\x32\x12.evaluation.Tensor\x12\x0e\n\x06reward\x18\x02 \x01(\x01\x12\x0c\n\x04\x64one\x18\x03 \x01(\x08\x12\x0c\n\x04info\x18\x04 \x01(\t\x12\x15\n\rcurrent_score\x18\x05 \x01(\x01\"\xb4\x01\n\x05Steps\x12(\n\x0cobservations\x18\x01 \x01(\x0b\x32\x12.evaluation.Tensor\x12#\n\x07rewards\x18\x02 \x01(\x0b\x32\x12.evaluation.Tensor\x12!\n\x05\x64ones\x18\x03 \x01(\x0b\x32\x12.evaluation.Tensor\x12\r\n\x05infos\x18\x04 \x03(\t\x12*\n\x0e\x63urrent_scores\x18\x05 \x01(\x0b\x32\x12.evaluation.Tensor2\x9f\x02\n\x0b\x45nvironment\x12>\n\x10get_action_space\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x12@\n\x12\x61\x63t_on_environment\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x12K\n\x19\x61\x63t_on_environment_stream\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00(\x01\x30\x01\x12\x41\n\x13\x61\x63t_on_environments\x12\x13.evaluation.Package\x1a\x13.evaluation.Package\"\x00\x62\x06proto3')
 )
 
 
@@ -40,6 +40,93 @@ _PACKAGE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='action', full_name='evaluation.Package.action', index=1,
+      number=2, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='action_space', full_name='evaluation.Package.action_space', index=2,
+      number=3, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='step', full_name='evaluation.Package.step', index=3,
+      number=4, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='actions', full_name='evaluation.Package.actions', index=4,
+      number=5, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='steps', full_name='evaluation.Package.steps', index=5,
+      number=6, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='num_environments', full_name='evaluation.Package.num_environments', index=6,
+      number=7, type=3, cpp_type=2, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=33,
+  serialized_end=275,
+)
+
+
+_TENSOR = _descriptor.Descriptor(
+  name='Tensor',
+  full_name='evaluation.Tensor',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='dtype', full_name='evaluation.Tensor.dtype', index=0,
+      number=1, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b("").decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='shape', full_name='evaluation.Tensor.shape', index=1,
+      number=2, type=3, cpp_type=2, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='data', full_name='evaluation.Tensor.data', index=2,
+      number=3, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b(""),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -52,11 +139,142 @@ _PACKAGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=32,
-  serialized_end=67,
+  serialized_start=277,
+  serialized_end=329,
 )
 
+
+_STEP = _descriptor.Descriptor(
+  name='Step',
+  full_name='evaluation.Step',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='observation', full_name='evaluation.Step.observation', index=0,
+      number=1, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='reward', full_name='evaluation.Step.reward', index=1,
+      number=2, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='done', full_name='evaluation.Step.done', index=2,
+      number=3, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='info', full_name='evaluation.Step.info', index=3,
+      number=4, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b("").decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='current_score', full_name='evaluation.Step.current_score', index=4,
+      number=5, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=331,
+  serialized_end=445,
+)
+
+
+_STEPS = _descriptor.Descriptor(
+  name='Steps',
+  full_name='evaluation.Steps',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='observations', full_name='evaluation.Steps.observations', index=0,
+      number=1, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='rewards', full_name='evaluation.Steps.rewards', index=1,
+      number=2, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='dones', full_name='evaluation.Steps.dones', index=2,
+      number=3, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='infos', full_name='evaluation.Steps.infos', index=3,
+      number=4, type=9, cpp_type=9, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='current_scores', full_name='evaluation.Steps.current_scores', index=4,
+      number=5, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto3',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=448,
+  serialized_end=628,
+)
+
+_PACKAGE.fields_by_name['action'].message_type = _TENSOR
+_PACKAGE.fields_by_name['action_space'].message_type = _TENSOR
+_PACKAGE.fields_by_name['step'].message_type = _STEP
+_PACKAGE.fields_by_name['actions'].message_type = _TENSOR
+_PACKAGE.fields_by_name['steps'].message_type = _STEPS
+_STEP.fields_by_name['observation'].message_type = _TENSOR
+_STEPS.fields_by_name['observations'].message_type = _TENSOR
+_STEPS.fields_by_name['rewards'].message_type = _TENSOR
+_STEPS.fields_by_name['dones'].message_type = _TENSOR
+_STEPS.fields_by_name['current_scores'].message_type = _TENSOR
 DESCRIPTOR.message_types_by_name['Package'] = _PACKAGE
+DESCRIPTOR.message_types_by_name['Tensor'] = _TENSOR
+DESCRIPTOR.message_types_by_name['Step'] = _STEP
+DESCRIPTOR.message_types_by_name['Steps'] = _STEPS
 _sym_db.RegisterFileDescriptor(DESCRIPTOR)
 
 Package = _reflection.GeneratedProtocolMessageType('Package', (_message.Message,), {
@@ -66,6 +284,27 @@ Package = _reflection.GeneratedProtocolMessageType('Package', (_message.Message,
   })
 _sym_db.RegisterMessage(Package)
 
+Tensor = _reflection.GeneratedProtocolMessageType('Tensor', (_message.Message,), {
+  'DESCRIPTOR' : _TENSOR,
+  '__module__' : 'evaluation_pb2'
+  # @@protoc_insertion_point(class_scope:evaluation.Tensor)
+  })
+_sym_db.RegisterMessage(Tensor)
+
+Step = _reflection.GeneratedProtocolMessageType('Step', (_message.Message,), {
+  'DESCRIPTOR' : _STEP,
+  '__module__' : 'evaluation_pb2'
+  # @@protoc_insertion_point(class_scope:evaluation.Step)
+  })
+_sym_db.RegisterMessage(Step)
+
+Steps = _reflection.GeneratedProtocolMessageType('Steps', (_message.Message,), {
+  'DESCRIPTOR' : _STEPS,
+  '__module__' : 'evaluation_pb2'
+  # @@protoc_insertion_point(class_scope:evaluation.Steps)
+  })
+_sym_db.RegisterMessage(Steps)
+
 
 
 _ENVIRONMENT = _descriptor.ServiceDescriptor(
@@ -74,8 +313,8 @@ _ENVIRONMENT = _descriptor.ServiceDescriptor(
   file=DESCRIPTOR,
   index=0,
   serialized_options=None,
-  serialized_start=70,
-  serialized_end=213,
+  serialized_start=631,
+  serialized_end=918,
   methods=[
   _descriptor.MethodDescriptor(
     name='get_action_space',
@@ -95,6 +334,24 @@ _ENVIRONMENT = _descriptor.ServiceDescriptor(
     output_type=_PACKAGE,
     serialized_options=None,
   ),
+  _descriptor.MethodDescriptor(
+    name='act_on_environment_stream',
+    full_name='evaluation.Environment.act_on_environment_stream',
+    index=2,
+    containing_service=None,
+    input_type=_PACKAGE,
+    output_type=_PACKAGE,
+    serialized_options=None,
+  ),
+  _descriptor.MethodDescriptor(
+    name='act_on_environments',
+    full_name='evaluation.Environment.act_on_environments',
+    index=3,
+    containing_service=None,
+    input_type=_PACKAGE,
+    output_type=_PACKAGE,
+    serialized_options=None,
+  ),
 ])
 _sym_db.RegisterServiceDescriptor(_ENVIRONMENT)
 
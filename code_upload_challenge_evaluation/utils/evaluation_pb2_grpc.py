@@ -24,6 +24,16 @@ class EnvironmentStub(object):
         request_serializer=evaluation__pb2.Package.SerializeToString,
         response_deserializer=evaluation__pb2.Package.FromString,
         )
+    self.act_on_environment_stream = channel.stream_stream(
+        '/evaluation.Environment/act_on_environment_stream',
+        request_serializer=evaluation__pb2.Package.SerializeToString,
+        response_deserializer=evaluation__pb2.Package.FromString,
+        )
+    self.act_on_environments = channel.unary_unary(
+        '/evaluation.Environment/act_on_environments',
+        request_serializer=evaluation__pb2.Package.SerializeToString,
+        response_deserializer=evaluation__pb2.Package.FromString,
+        )
 
 
 class EnvironmentServicer(object):
@@ -44,6 +54,20 @@ class EnvironmentServicer(object):
     context.set_details('Method not implemented!')
     raise NotImplementedError('Method not implemented!')
 
+  def act_on_environment_stream(self, request_iterator, context):
+    """Steps the environment once per action over one long-lived call
+    """
+    context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+    context.set_details('Method not implemented!')
+    raise NotImplementedError('Method not implemented!')
+
+  def act_on_environments(self, request, context):
+    """Steps every copy of a vectorized environment with one action each
+    """
+    context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+    context.set_details('Method not implemented!')
+    raise NotImplementedError('Method not implemented!')
+
 
 def add_EnvironmentServicer_to_server(servicer, server):
   rpc_method_handlers = {
@@ -57,6 +81,16 @@ def add_EnvironmentServicer_to_server(servicer, server):
           request_deserializer=evaluation__pb2.Package.FromString,
           response_serializer=evaluation__pb2.Package.SerializeToString,
       ),
+      'act_on_environment_stream': grpc.stream_stream_rpc_method_handler(
+          servicer.act_on_environment_stream,
+          request_deserializer=evaluation__pb2.Package.FromString,
+          response_serializer=evaluation__pb2.Package.SerializeToString,
+      ),
+      'act_on_environments': grpc.unary_unary_rpc_method_handler(
+          servicer.act_on_environments,
+          request_deserializer=evaluation__pb2.Package.FromString,
+          response_serializer=evaluation__pb2.Package.SerializeToString,
+      ),
   }
   generic_handler = grpc.method_handlers_generic_handler(
       'evaluation.Environment', rpc_method_handlers)
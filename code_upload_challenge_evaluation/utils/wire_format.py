@@ -0,0 +1,266 @@
+import json
+import os
+import pickle
+
+import numpy as np
+
+import evaluation_pb2
+
+# Encoding of the Package messages, "tensor" or the "pickle" fallback. Both
+# sides of a channel use the same one, and only the "pickle" format makes
+# the environment unpickle the bytes sent by a participant's agent.
+WIRE_FORMAT = os.environ.get("WIRE_FORMAT", "tensor")
+WIRE_FORMATS = ("tensor", "pickle")
+
+if WIRE_FORMAT not in WIRE_FORMATS:
+    raise ValueError(
+        "WIRE_FORMAT must be one of {}, not {!r}".format(WIRE_FORMATS, WIRE_FORMAT)
+    )
+
+
+def to_tensor(value):
+    """Typed message of a number or an array
+
+    Args:
+        value ([object]): Number, sequence of numbers or NumPy array
+
+    Returns:
+        [evaluation_pb2.Tensor]: Its dtype, shape and bytes
+    """
+    array = np.asarray(value)
+    if array.dtype.hasobject:
+        raise TypeError("Cannot send an array of Python objects as a Tensor")
+    return evaluation_pb2.Tensor(
+        dtype=array.dtype.str, shape=array.shape, data=array.tobytes()
+    )
+
+
+def from_tensor(tensor):
+    """Array of a typed message, a read-only view of its bytes without a copy
+
+    Args:
+        tensor ([evaluation_pb2.Tensor]): Message of `to_tensor`
+
+    Returns:
+        [np.ndarray]: The array
+    """
+    try:
+        dtype = np.dtype(tensor.dtype)
+    except TypeError:
+        # Malformed messages raise ValueError, which the servicer answers
+        # with INVALID_ARGUMENT
+        raise ValueError("Tensor of unknown dtype {!r}".format(tensor.dtype))
+    if dtype.hasobject:
+        raise ValueError("Tensor of Python objects")
+    return np.frombuffer(tensor.data, dtype=dtype).reshape(tuple(tensor.shape))
+
+
+def unpickle(package, allow_pickle):
+    if not allow_pickle:
+        raise ValueError(
+            "Got a pickled message, set WIRE_FORMAT=pickle on both sides to "
+            "accept them"
+        )
+    return pickle.loads(package.SerializedEntity)
+
+
+def jsonable(value):
+    # NumPy numbers and arrays in the info of a step
+    return getattr(value, "tolist", lambda: repr(value))()
+
+
+def pack_action(action, wire_format=WIRE_FORMAT):
+    """Message of an action of the agent
+
+    Args:
+        action ([object]): Action, e.g. an int for a discrete action space
+        wire_format ([str], optional): One of `WIRE_FORMATS`. Defaults to
+            `WIRE_FORMAT`.
+
+    Returns:
+        [evaluation_pb2.Package]: The message
+    """
+    if wire_format == "pickle":
+        return evaluation_pb2.Package(SerializedEntity=pickle.dumps(action))
+    return evaluation_pb2.Package(action=to_tensor(action))
+
+
+def unpack_action(package, allow_pickle=WIRE_FORMAT == "pickle"):
+    """Action of a message of `pack_action`
+
+    Args:
+        package ([evaluation_pb2.Package]): The message
+        allow_pickle ([bool], optional): Whether to unpickle a message of the
+            "pickle" format. Defaults to whether `WIRE_FORMAT` is "pickle".
+
+    Returns:
+        [object]: Python number of a scalar action, array otherwise
+    """
+    if not package.HasField("action"):
+        return unpickle(package, allow_pickle)
+    action = from_tensor(package.action)
+    return action.item() if action.ndim == 0 else action
+
+
+def pack_action_space(actions, wire_format=WIRE_FORMAT, num_environments=1):
+    """Message of the actions the environment takes
+
+    Args:
+        actions ([list]): The actions of a discrete action space
+        wire_format ([str], optional): One of `WIRE_FORMATS`. Defaults to
+            `WIRE_FORMAT`.
+        num_environments ([int], optional): Copies of the environment, which
+            is vectorized if more than one. Defaults to 1.
+
+    Returns:
+        [evaluation_pb2.Package]: The message
+    """
+    if wire_format == "pickle":
+        return evaluation_pb2.Package(
+            SerializedEntity=pickle.dumps(actions), num_environments=num_environments
+        )
+    return evaluation_pb2.Package(
+        action_space=to_tensor(actions), num_environments=num_environments
+    )
+
+
+def unpack_action_space(package, allow_pickle=WIRE_FORMAT == "pickle"):
+    """Actions of a message of `pack_action_space`
+
+    Args:
+        package ([evaluation_pb2.Package]): The message
+        allow_pickle ([bool], optional): Whether to unpickle a message of the
+            "pickle" format. Defaults to whether `WIRE_FORMAT` is "pickle".
+
+    Returns:
+        [list]: The actions
+    """
+    if not package.HasField("action_space"):
+        return unpickle(package, allow_pickle)
+    return from_tensor(package.action_space).tolist()
+
+
+def pack_step(feedback, current_score, wire_format=WIRE_FORMAT):
+    """Message of the result of one step of the environment
+
+    Args:
+        feedback ([tuple]): (observation, reward, done, info) of `gym.Env.step`
+        current_score ([float]): Score of the episode so far
+        wire_format ([str], optional): One of `WIRE_FORMATS`. Defaults to
+            `WIRE_FORMAT`.
+
+    Returns:
+        [evaluation_pb2.Package]: The message
+    """
+    if wire_format == "pickle":
+        return evaluation_pb2.Package(
+            SerializedEntity=pickle.dumps(
+                {"feedback": feedback, "current_score": current_score}
+            )
+        )
+    observation, reward, done, info = feedback
+    return evaluation_pb2.Package(
+        step=evaluation_pb2.Step(
+            observation=to_tensor(observation),
+            reward=reward,
+            done=done,
+            info=json.dumps(info, default=jsonable),
+            current_score=current_score,
+        )
+    )
+
+
+def unpack_step(package, allow_pickle=WIRE_FORMAT == "pickle"):
+    """Result of a step of a message of `pack_step`
+
+    Args:
+        package ([evaluation_pb2.Package]): The message
+        allow_pickle ([bool], optional): Whether to unpickle a message of the
+            "pickle" format. Defaults to whether `WIRE_FORMAT` is "pickle".
+
+    Returns:
+        [dict]: "feedback" (observation, reward, done, info) and
+            "current_score" of the step
+    """
+    if not package.HasField("step"):
+        return unpickle(package, allow_pickle)
+    step = package.step
+    return {
+        "feedback": (
+            from_tensor(step.observation),
+            step.reward,
+            step.done,
+            json.loads(step.info) if step.info else {},
+        ),
+        "current_score": step.current_score,
+    }
+
+
+def pack_actions(actions):
+    """Message of one action for every copy of a vectorized environment
+
+    Args:
+        actions ([object]): Sequence or array of the actions, one per copy
+
+    Returns:
+        [evaluation_pb2.Package]: The message
+    """
+    return evaluation_pb2.Package(actions=to_tensor(actions))
+
+
+def unpack_actions(package):
+    """Actions of a message of `pack_actions`
+
+    Args:
+        package ([evaluation_pb2.Package]): The message
+
+    Returns:
+        [np.ndarray]: The actions, one per copy along axis 0
+    """
+    if not package.HasField("actions"):
+        raise ValueError("A batch of actions needs the tensor wire format")
+    return from_tensor(package.actions)
+
+
+def pack_steps(feedbacks, current_scores):
+    """Message of the results of a step of every copy of an environment
+
+    Args:
+        feedbacks ([list]): (observation, reward, done, info) of every copy
+        current_scores ([list]): Score of the episode of every copy
+
+    Returns:
+        [evaluation_pb2.Package]: The message
+    """
+    observations, rewards, dones, infos = zip(*feedbacks)
+    return evaluation_pb2.Package(
+        steps=evaluation_pb2.Steps(
+            observations=to_tensor(np.stack(observations)),
+            rewards=to_tensor(np.array(rewards, dtype=np.float64)),
+            dones=to_tensor(np.array(dones, dtype=bool)),
+            infos=[json.dumps(info, default=jsonable) for info in infos],
+            current_scores=to_tensor(np.array(current_scores, dtype=np.float64)),
+        )
+    )
+
+
+def unpack_steps(package):
+    """Results of a message of `pack_steps`
+
+    Args:
+        package ([evaluation_pb2.Package]): The message
+
+    Returns:
+        [dict]: "feedback" (observations, rewards, dones, infos) and
+            "current_score" of every copy, stacked along axis 0
+    """
+    steps = package.steps
+    return {
+        "feedback": (
+            from_tensor(steps.observations),
+            from_tensor(steps.rewards),
+            from_tensor(steps.dones),
+            [json.loads(info) if info else {} for info in steps.infos],
+        ),
+        "current_score": from_tensor(steps.current_scores),
+    }
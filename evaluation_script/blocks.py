@@ -0,0 +1,106 @@
+import numpy as np
+
+from . import conll
+from .conll import is_token_line
+
+BLOCK_SIZE = 4 << 20
+
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[list(conll.WHITESPACE.encode("ascii"))] = True
+# First bytes of lines that need the exact check of `is_token_line`
+SUSPICIOUS = WHITESPACE.copy()
+SUSPICIOUS[list(b"-#")] = True
+
+
+def iter_blocks(f, block_size=BLOCK_SIZE):
+    """Read a file in large blocks of complete lines
+
+    Args:
+        f ([file]): File opened in binary mode
+        block_size ([int], optional): Bytes read per step. Defaults to
+            `BLOCK_SIZE`.
+
+    Yields:
+        [bytes]: Consecutive blocks of lines, each line ending with a newline
+    """
+    remainder = b""
+    while True:
+        block = f.read(block_size)
+        data = remainder + block
+        if block:
+            end = data.rfind(b"\n") + 1
+            data, remainder = data[:end], data[end:]
+        elif data and not data.endswith(b"\n"):
+            data += b"\n"
+        if data:
+            yield data
+        if not block:
+            break
+
+
+def classify_lines(data):
+    """Find the lines of a block of bytes and tell token lines apart
+
+    Args:
+        data ([bytes]): Complete lines, each ending with a newline
+
+    Returns:
+        [tuple]: (starts, is_token) arrays with the byte offset of every line
+            and whether `read_sentences` reads it as a token line
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord("\n")) + 1
+    starts = np.concatenate([[0], ends[:-1]])
+    # Every line holds at least its newline, so no segment is empty
+    is_token = np.logical_or.reduceat(~WHITESPACE[buf], starts)
+    for line in np.flatnonzero(is_token & SUSPICIOUS[buf[starts]]):
+        is_token[line] = is_token_line(data[starts[line] : ends[line]].decode("utf-8"))
+    return starts, is_token
+
+
+def split_columns(data, starts, lines):
+    """Locate the first and the last column of some lines of a block
+
+    Args:
+        data ([bytes]): Complete lines, each ending with a newline
+        starts ([np.ndarray]): Byte offset of every line of the block
+        lines ([np.ndarray]): Lines to look at, each with at least one column
+
+    Returns:
+        [tuple]: (first_starts, first_ends, last_starts, last_ends) byte
+            ranges of the first and the last column of every line
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    visible = ~WHITESPACE[buf]
+    is_start = visible.copy()
+    is_start[1:] &= ~visible[:-1]
+    is_end = visible.copy()
+    is_end[:-1] &= ~visible[1:]
+    column_starts = np.flatnonzero(is_start)
+    column_ends = np.flatnonzero(is_end) + 1
+    # Newlines are whitespace, so columns never run across lines
+    line_ends = np.append(starts[1:], len(buf))
+    first = np.searchsorted(column_starts, starts[lines])
+    last = np.searchsorted(column_starts, line_ends[lines]) - 1
+    return (
+        column_starts[first],
+        column_ends[first],
+        column_starts[last],
+        column_ends[last],
+    )
+
+
+def gather(buf, starts, lengths):
+    """Concatenate byte ranges of an array
+
+    Args:
+        buf ([np.ndarray]): uint8 array
+        starts ([np.ndarray]): Start of every range
+        lengths ([np.ndarray]): Length of every range
+
+    Returns:
+        [np.ndarray]: Bytes of all ranges, one after the other
+    """
+    offsets = np.cumsum(lengths) - lengths
+    index = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    return buf[index]
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+
+from .scorer import f1_score
+
+# Resamples per confidence interval, 0 turns the bootstrap off
+BOOTSTRAP_SAMPLES = int(os.environ.get("EVALUATION_BOOTSTRAP_SAMPLES", 1000))
+# A fixed seed draws the same resamples for every submission, so the
+# intervals of two submissions come from a paired bootstrap
+BOOTSTRAP_SEED = 0
+CONFIDENCE = 0.95
+# Upper bound on the entries of one batch of resampling weights
+WEIGHTS_BATCH_SIZE = 1 << 22
+
+
+def resampling_weights(num_sentences, num_samples, rng):
+    """Draw how often every sentence appears in each bootstrap resample
+
+    Args:
+        num_sentences ([int]): Number of sentences of the split
+        num_samples ([int]): Number of resamples
+        rng ([np.random.Generator]): Random number generator
+
+    Returns:
+        [np.ndarray]: (num_samples, num_sentences) multinomial weight matrix,
+            every row sums to `num_sentences`
+    """
+    draws = rng.integers(0, num_sentences, size=(num_samples, num_sentences))
+    draws += np.arange(num_samples)[:, None] * num_sentences
+    weights = np.bincount(draws.ravel(), minlength=num_samples * num_sentences)
+    return weights.reshape(num_samples, num_sentences)
+
+
+def bootstrap_counts(sentence_counts, num_samples, seed=BOOTSTRAP_SEED):
+    """Counters of bootstrap resamples of the sentences
+
+    Resampling sentences with replacement is the same as weighting the
+    per-sentence counters with a multinomial weight matrix, so a whole batch
+    of resamples is a single matrix product.
+
+    Args:
+        sentence_counts ([np.ndarray]): (num_sentences, num_types, 3) tp, fp
+            and fn of every sentence
+        num_samples ([int]): Number of resamples
+        seed ([int], optional): Seed of the resamples. Defaults to
+            `BOOTSTRAP_SEED`.
+
+    Returns:
+        [np.ndarray]: (num_samples, num_types, 3) counters of every resample
+    """
+    num_sentences, num_types, _ = sentence_counts.shape
+    rng = np.random.default_rng(seed)
+    matrix = sentence_counts.reshape(num_sentences, -1).astype(np.float64)
+    batch_size = max(1, WEIGHTS_BATCH_SIZE // max(num_sentences, 1))
+    samples = []
+    for start in range(0, num_samples, batch_size):
+        weights = resampling_weights(
+            num_sentences, min(batch_size, num_samples - start), rng
+        )
+        samples.append(weights.astype(np.float64) @ matrix)
+    samples = np.concatenate(samples) if samples else np.zeros((0, matrix.shape[1]))
+    return samples.reshape(num_samples, num_types, 3)
+
+
+def confidence_intervals(
+    sentence_counts, num_samples=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE
+):
+    """Bootstrap confidence intervals of the micro F1 and the per-type F1
+
+    Args:
+        sentence_counts ([np.ndarray]): (num_sentences, num_types, 3) tp, fp
+            and fn of every sentence of one split
+        num_samples ([int], optional): Number of resamples. Defaults to
+            `BOOTSTRAP_SAMPLES`.
+        confidence ([float], optional): Coverage of the intervals. Defaults
+            to `CONFIDENCE`.
+
+    Returns:
+        [tuple]: ((low, high) of the micro F1, (2, num_types) array of the
+            per-type F1 bounds), all in percent
+    """
+    num_types = sentence_counts.shape[1]
+    if not num_samples or not len(sentence_counts):
+        counts = sentence_counts.sum(axis=0)
+        total = 100.0 * float(f1_score(*counts.sum(axis=0)))
+        per_type = 100.0 * f1_score(*counts.T)
+        return (total, total), np.stack([per_type, per_type])
+    samples = bootstrap_counts(sentence_counts, num_samples)
+    percentiles = [50.0 * (1 - confidence), 50.0 * (1 + confidence)]
+    # Resamples without any span of a type say nothing about its F1
+    totals = samples.sum(axis=1)
+    present = totals.any(axis=1)
+    total = 100.0 * f1_score(*totals[present].T)
+    low, high = np.percentile(total, percentiles) if len(total) else (0.0, 0.0)
+    type_bounds = np.zeros((2, num_types))
+    for type_id in np.flatnonzero(samples.any(axis=(0, 2))):
+        type_samples = samples[:, type_id]
+        type_samples = type_samples[type_samples.any(axis=1)]
+        type_bounds[:, type_id] = np.percentile(
+            100.0 * f1_score(*type_samples.T), percentiles
+        )
+    return (float(low), float(high)), type_bounds
@@ -0,0 +1,128 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+
+from .index import CACHE_DIR
+
+# Bump when a scoring change makes cached results stale
+CACHE_VERSION = 5
+RESULT_CACHE_DIR = os.path.join(CACHE_DIR, "results")
+RESULT_CACHE_SIZE = int(os.environ.get("EVALUATION_RESULT_CACHE_SIZE", 64 << 20))
+# Lookups of all the result caches of this process by "hit" or "miss"
+REQUESTS = collections.Counter()
+
+
+class ResultCache:
+    def __init__(self, directory=None, max_size=None):
+        """On-disk cache of evaluation results with LRU eviction
+
+        Every entry is a small JSON file. Reading an entry refreshes its
+        modification time, and once the entries take more than `max_size`
+        bytes the least recently used ones are removed.
+
+        Args:
+            directory ([str], optional): Directory of the cache entries.
+                Defaults to `RESULT_CACHE_DIR`.
+            max_size ([int], optional): Size limit in bytes, 0 disables the
+                cache. Defaults to `RESULT_CACHE_SIZE`.
+        """
+        self.directory = directory or RESULT_CACHE_DIR
+        self.max_size = RESULT_CACHE_SIZE if max_size is None else max_size
+        self.size = None
+
+    @staticmethod
+    def key(*parts):
+        """Cache key for a tuple of JSON serializable parts"""
+        encoded = json.dumps([CACHE_VERSION] + list(parts)).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """Look up an entry
+
+        Args:
+            key ([str]): Key from `ResultCache.key`
+
+        Returns:
+            [object]: Cached value, or None on a miss
+        """
+        if not self.max_size:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            REQUESTS["miss"] += 1
+            return None
+        REQUESTS["hit"] += 1
+        return value
+
+    def put(self, key, value):
+        """Store an entry and evict the least recently used ones if needed
+
+        Args:
+            key ([str]): Key from `ResultCache.key`
+            value ([object]): JSON serializable value
+        """
+        if not self.max_size:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+                written = f.tell()
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        # The directory is only scanned again once the running total, which
+        # misses entries written by other processes, goes over the limit.
+        if self.size is None:
+            self.evict()
+        else:
+            self.size += written
+            if self.size > self.max_size:
+                self.evict()
+
+    def fetch(self, key, compute):
+        """Return the cached value of a key, computing and storing it on a miss
+
+        Args:
+            key ([str]): Key from `ResultCache.key`
+            compute ([callable]): Computes the value without arguments
+
+        Returns:
+            [object]: Cached or computed value
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self.size = total
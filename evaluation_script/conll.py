@@ -0,0 +1,87 @@
+import re
+
+DOCUMENT_START = "-DOCSTART-"
+SPLIT_DIRECTIVE = "# split ="
+# Characters that separate columns and make up blank lines. Only ASCII ones
+# count, so that a token with e.g. a no-break space (U+00A0) stays one token,
+# as the byte-level classifier of `blocks` sees it. These are exactly the
+# ASCII characters `str.split()` splits on.
+WHITESPACE = " \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+COLUMN_SEPARATOR = re.compile("[{}]+".format(re.escape(WHITESPACE)))
+
+
+def read_sentences(lines, split=None, first_line=1):
+    """Stream sentences out of a CoNLL/BIO formatted file
+
+    Every non-blank line holds one token, the token text in the first column
+    and its BIO tag in the last one. Sentences are separated by blank lines.
+    A `# split = <codename>` line assigns the following sentences to that
+    dataset split until the next such line.
+
+    Args:
+        lines ([iterable]): Lines of the file, e.g. an open file object
+        split ([str], optional): Split of the sentences before the first
+            split directive. Defaults to None.
+        first_line ([int], optional): Line number of the first line.
+            Defaults to 1.
+
+    Yields:
+        [tuple]: (split, tokens, tags, line_number) for every sentence, where
+            line_number is the line on which the sentence starts
+    """
+    tokens, tags = [], []
+    start = None
+    for line_number, line in enumerate(lines, first_line):
+        line = line.strip(WHITESPACE)
+        if not line or line.startswith(DOCUMENT_START):
+            if tokens:
+                yield split, tokens, tags, start
+                tokens, tags = [], []
+            continue
+        if line.startswith(SPLIT_DIRECTIVE):
+            if tokens:
+                yield split, tokens, tags, start
+                tokens, tags = [], []
+            split = line[len(SPLIT_DIRECTIVE) :].strip(WHITESPACE)
+            continue
+        columns = split_line(line)
+        if not tokens:
+            start = line_number
+        tokens.append(columns[0])
+        tags.append(columns[-1])
+    if tokens:
+        yield split, tokens, tags, start
+
+
+def split_line(line):
+    """Columns of a stripped line, separated by runs of `WHITESPACE`"""
+    if line.isascii():
+        return line.split()
+    return COLUMN_SEPARATOR.split(line)
+
+
+def is_token_line(line):
+    """Whether `read_sentences` reads a line as a token of a sentence"""
+    line = line.strip(WHITESPACE)
+    return not (
+        not line or line.startswith(DOCUMENT_START) or line.startswith(SPLIT_DIRECTIVE)
+    )
+
+
+def count_sentences(lines):
+    """Count the sentences `read_sentences` would yield without parsing them
+
+    Args:
+        lines ([iterable]): Lines of the file
+
+    Returns:
+        [int]: Number of sentences
+    """
+    count = 0
+    in_sentence = False
+    for line in lines:
+        is_token = is_token_line(line)
+        if is_token and not in_sentence:
+            count += 1
+        in_sentence = is_token
+    return count
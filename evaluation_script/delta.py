@@ -0,0 +1,136 @@
+import hashlib
+import io
+
+import numpy as np
+
+from .blocks import BLOCK_SIZE, classify_lines, iter_blocks
+from .conll import read_sentences
+from .formats import open_text_submission
+from .scorer import combine_counts, remap_counts, score_submission
+
+CHUNK_SENTENCES = 1024
+
+
+def iter_chunks(f, chunk_sentences=CHUNK_SENTENCES, block_size=BLOCK_SIZE):
+    """Cut a submission into fixed-size sentence blocks without parsing it
+
+    The file is read in large blocks and its lines are classified with NumPy,
+    so blocks can be hashed much faster than they can be scored.
+
+    Args:
+        f ([file]): Submission opened in binary mode
+        chunk_sentences ([int], optional): Sentences per block. Defaults to
+            `CHUNK_SENTENCES`.
+        block_size ([int], optional): Bytes read per step. Defaults to
+            `BLOCK_SIZE`.
+
+    Yields:
+        [tuple]: (first_sentence, num_sentences, first_line, data) per block
+    """
+    pieces = []
+    chunk_sentence, chunk_line = 0, 1
+    total, line_number = 0, 1
+    in_sentence = False
+    for data in iter_blocks(f, block_size):
+        starts, is_token = classify_lines(data)
+        previous = np.empty_like(is_token)
+        previous[0] = in_sentence
+        previous[1:] = is_token[:-1]
+        sentence_lines = np.flatnonzero(is_token & ~previous)
+        ordinals = total + np.arange(len(sentence_lines))
+        cuts = (ordinals % chunk_sentences == 0) & (ordinals > 0)
+        position = 0
+        for line, ordinal in zip(sentence_lines[cuts], ordinals[cuts]):
+            pieces.append(data[position : starts[line]])
+            yield chunk_sentence, ordinal - chunk_sentence, chunk_line, b"".join(pieces)
+            pieces = []
+            chunk_sentence, chunk_line = int(ordinal), line_number + int(line)
+            position = starts[line]
+        pieces.append(data[position:])
+        total += len(sentence_lines)
+        line_number += len(starts)
+        in_sentence = bool(is_token[-1])
+    if total > chunk_sentence:
+        yield chunk_sentence, total - chunk_sentence, chunk_line, b"".join(pieces)
+
+
+def score_chunk(
+    gold_index, data, first_sentence, num_sentences, first_line, per_sentence=False
+):
+    sentences = read_sentences(
+        io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline="\n"),
+        first_line=first_line,
+    )
+    counts, vocabulary = score_submission(
+        gold_index,
+        sentences,
+        first_sentence=first_sentence,
+        last_sentence=first_sentence + num_sentences,
+        per_sentence=per_sentence,
+    )
+    return {"entity_types": vocabulary.entity_types, "counts": counts.tolist()}
+
+
+def score_submission_delta(gold_index, user_submission_file, cache, per_sentence=False):
+    """Score a submission, reusing the counters of unchanged sentence blocks
+
+    The submission is cut into blocks of `CHUNK_SENTENCES` sentences. The
+    tp/fp/fn counters of every block are cached under the hash of its raw
+    bytes and its position, so a resubmission that only changes a few blocks
+    only parses and scores those blocks.
+
+    Args:
+        gold_index ([GoldIndex]): Compiled gold annotations
+        user_submission_file ([str]): Path to the submitted CoNLL/BIO file
+        cache ([ResultCache]): Cache of the block counters
+        per_sentence ([bool], optional): Whether to count every sentence in
+            its own row instead of in its split group. Defaults to False.
+
+    Returns:
+        [tuple]: ((num_groups, num_types, 3) table of tp, fp and fn per
+            split group and entity type, or (num_sentences, num_types, 3)
+            with `per_sentence`, TagVocabulary)
+    """
+    vocabulary = gold_index.vocabulary()
+    tables = []
+    total = 0
+    with open_text_submission(user_submission_file) as f:
+        for first_sentence, num_sentences, first_line, data in iter_chunks(f):
+            total = first_sentence + num_sentences
+            if total > gold_index.num_sentences:
+                raise ValueError(
+                    "The submission has more sentences than the annotations"
+                )
+            key = cache.key(
+                "chunk",
+                gold_index.source_sha256,
+                first_sentence,
+                hashlib.sha256(data).hexdigest(),
+                per_sentence,
+            )
+            chunk = cache.fetch(
+                key,
+                lambda: score_chunk(
+                    gold_index,
+                    data,
+                    first_sentence,
+                    num_sentences,
+                    first_line,
+                    per_sentence,
+                ),
+            )
+            table = np.array(chunk["counts"], dtype=np.int64)
+            rows = num_sentences if per_sentence else gold_index.num_groups
+            tables.append(
+                remap_counts(
+                    table.reshape(rows, -1, 3), chunk["entity_types"], vocabulary
+                )
+            )
+    if total < gold_index.num_sentences:
+        raise ValueError(
+            "The submission ends after {} sentences, expected {}".format(
+                total, gold_index.num_sentences
+            )
+        )
+    counts = combine_counts(tables, gold_index.num_groups, per_sentence)
+    return counts, vocabulary
@@ -0,0 +1,184 @@
+import gzip
+import struct
+import zipfile
+
+import numpy as np
+
+TEXT = "text"
+GZIP = "gzip"
+ZIP = "zip"
+NPY = "npy"
+NPZ = "npz"
+HDF5 = "hdf5"
+# Formats that hold an array of tag ids instead of CoNLL/BIO text
+TAG_ID_FORMATS = (NPY, NPZ, HDF5)
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZIP_MAGIC = b"PK\x03\x04"
+HDF5_MAGIC = b"\x89HDF\r\n\x1a\n"
+
+# Names of the tag-id array and of the optional tag names in .npz and .h5
+TAG_IDS_KEY = "tag_ids"
+TAGS_KEY = "tags"
+
+
+def sniff_format(user_submission_file):
+    """Detect the format of a submission from its first bytes
+
+    The file extension is not trusted, since EvalAI may store uploads under
+    any name.
+
+    Args:
+        user_submission_file ([str]): Path to the submission
+
+    Returns:
+        [str]: One of `TEXT`, `GZIP`, `ZIP`, `NPY`, `NPZ` or `HDF5`
+    """
+    with open(user_submission_file, "rb") as f:
+        head = f.read(len(HDF5_MAGIC))
+    if head.startswith(np.lib.format.MAGIC_PREFIX):
+        return NPY
+    if head.startswith(GZIP_MAGIC):
+        return GZIP
+    if head.startswith(HDF5_MAGIC):
+        return HDF5
+    if head.startswith(ZIP_MAGIC):
+        with zipfile.ZipFile(user_submission_file) as archive:
+            names = archive.namelist()
+        if TAG_IDS_KEY + ".npy" in names:
+            return NPZ
+        return ZIP
+    return TEXT
+
+
+def open_text_submission(user_submission_file, submission_format=None):
+    """Open a CoNLL/BIO submission as a binary stream
+
+    Compressed submissions are decompressed on the fly while they are read,
+    never into a temporary file.
+
+    Args:
+        user_submission_file ([str]): Path to the submission
+        submission_format ([str], optional): Format from `sniff_format`.
+            Defaults to sniffing it.
+
+    Returns:
+        [file]: Binary file object of the CoNLL/BIO text
+    """
+    submission_format = submission_format or sniff_format(user_submission_file)
+    if submission_format == GZIP:
+        return gzip.open(user_submission_file, "rb")
+    if submission_format == ZIP:
+        with zipfile.ZipFile(user_submission_file) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir()]
+            if len(members) != 1:
+                raise ValueError(
+                    "A zipped submission must hold exactly one file, found {}".format(
+                        len(members)
+                    )
+                )
+            # The member stays readable after the archive is closed
+            return archive.open(members[0])
+    if submission_format in TAG_ID_FORMATS:
+        raise ValueError("The submission holds tag ids, not CoNLL/BIO text")
+    return open(user_submission_file, "rb")
+
+
+def map_stored_array(user_submission_file, info):
+    """Memory-map an uncompressed .npy member of a zip archive
+
+    Args:
+        user_submission_file ([str]): Path to the archive
+        info ([zipfile.ZipInfo]): Member stored without compression
+
+    Returns:
+        [np.memmap]: Array of the member, or None for unsupported headers
+    """
+    with open(user_submission_file, "rb") as f:
+        # Skip the local file header, which has its own name and extra fields
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack("<HH", f.read(4))
+        f.seek(name_length + extra_length, 1)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            header = np.lib.format.read_array_header_2_0(f)
+        else:
+            return None
+        offset = f.tell()
+    shape, fortran_order, dtype = header
+    if dtype.hasobject:
+        raise ValueError("The tag ids of the submission must be integers")
+    return np.memmap(
+        user_submission_file,
+        dtype=dtype,
+        mode="r",
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def tag_names(array):
+    """Decode an array of byte or unicode strings into tag names"""
+    return [
+        tag.decode("utf-8") if isinstance(tag, bytes) else str(tag)
+        for tag in array.tolist()
+    ]
+
+
+def load_tag_ids(user_submission_file, submission_format=None):
+    """Open the tag-id array of a binary submission without reading it
+
+    A .npy file holds the tag ids of all gold tokens in order, as indices into
+    `canonical_tags` of the gold entity types. A .npz archive or .h5 file holds
+    them under `tag_ids`, optionally with the tag names the ids index into
+    under `tags`.
+
+    Args:
+        user_submission_file ([str]): Path to the submission
+        submission_format ([str], optional): Format from `sniff_format`.
+            Defaults to sniffing it.
+
+    Returns:
+        [tuple]: (tag_ids, tags) with a sliceable array of tag ids and the
+            list of tag names, or None for the canonical tags
+    """
+    submission_format = submission_format or sniff_format(user_submission_file)
+    if submission_format == NPY:
+        return np.load(user_submission_file, mmap_mode="r", allow_pickle=False), None
+    if submission_format == NPZ:
+        with zipfile.ZipFile(user_submission_file) as archive:
+            info = archive.getinfo(TAG_IDS_KEY + ".npy")
+            tag_ids = None
+            if info.compress_type == zipfile.ZIP_STORED:
+                tag_ids = map_stored_array(user_submission_file, info)
+            if tag_ids is None:
+                # Compressed members can only be inflated into memory, which
+                # still never builds Python strings.
+                with archive.open(info) as f:
+                    tag_ids = np.lib.format.read_array(f, allow_pickle=False)
+            tags = None
+            if TAGS_KEY + ".npy" in archive.namelist():
+                with archive.open(TAGS_KEY + ".npy") as f:
+                    tags = tag_names(np.lib.format.read_array(f, allow_pickle=False))
+        return tag_ids, tags
+    if submission_format == HDF5:
+        try:
+            import h5py
+        except ImportError:
+            raise ValueError("Reading .h5 submissions requires the h5py package")
+        with h5py.File(user_submission_file, "r") as h5_file:
+            if TAG_IDS_KEY not in h5_file:
+                raise ValueError(
+                    "The .h5 submission has no {!r} dataset".format(TAG_IDS_KEY)
+                )
+            # Read into memory before the file is closed, like a compressed
+            # .npz member
+            tag_ids = h5_file[TAG_IDS_KEY][()]
+            tags = None
+            if TAGS_KEY in h5_file:
+                tags = tag_names(h5_file[TAGS_KEY][()])
+        return tag_ids, tags
+    raise ValueError("The submission holds CoNLL/BIO text, not tag ids")
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .conll import read_sentences
+from .kernel import extract_spans
+from .tags import TagVocabulary
+
+# Bump when the parsing of the annotations changes, old indexes get recompiled
+INDEX_VERSION = 3
+INDEX_MAGIC = "NERIDX{}\n".format(INDEX_VERSION).encode("ascii")
+INDEX_ALIGNMENT = 64
+CACHE_DIR = os.environ.get(
+    "EVALUATION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "evaluation_cache")
+)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash a file without reading it into memory at once
+
+    Args:
+        path ([str]): Path of the file
+        chunk_size ([int], optional): Bytes read per step. Defaults to 1 MiB.
+
+    Returns:
+        [str]: Hex digest of the SHA-256 of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GoldIndex:
+    def __init__(self, path):
+        """Memory-mapped view of a compiled gold annotation index
+
+        The index holds the token texts (`tokens` bytes with `token_offsets`),
+        the gold `tag_ids`, the gold spans (`span_starts`, `span_ends`,
+        `span_types`, in corpus-wide token positions) and two per-sentence
+        tables: `sentence_offsets` into the tokens and `span_offsets` into the
+        spans, each with one extra trailing entry. `sentence_splits` holds the
+        position of every sentence's split in `splits`, or -1.
+
+        Args:
+            path ([str]): Path of the index file written by `compile_index`
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError("{} is not a gold annotation index".format(path))
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size).decode("utf-8"))
+        self.source_sha256 = header["source_sha256"]
+        self.tags = header["tags"]
+        self.splits = header["splits"]
+        for name, (dtype, offset, length) in header["arrays"].items():
+            if length:
+                array = np.memmap(
+                    path, dtype=dtype, mode="r", offset=offset, shape=(length,)
+                )
+            else:
+                array = np.zeros(0, dtype=dtype)
+            setattr(self, name, array)
+
+    @property
+    def num_sentences(self):
+        return len(self.sentence_offsets) - 1
+
+    def vocabulary(self):
+        """Build a tag vocabulary that agrees with the gold tag ids"""
+        return TagVocabulary(self.tags[1:])
+
+    def split_id(self, split):
+        return self.splits.index(split) if split in self.splits else -1
+
+    @property
+    def num_groups(self):
+        return len(self.splits) + 1
+
+    def sentence_groups(self, first, last):
+        """Split membership of a range of sentences
+
+        Group 0 holds the sentences without a split, group `split_id + 1` the
+        sentences of a split.
+
+        Args:
+            first ([int]): Index of the first sentence
+            last ([int]): Index after the last sentence
+
+        Returns:
+            [np.ndarray]: Group of every sentence in the range
+        """
+        return self.sentence_splits[first:last].astype(np.int64) + 1
+
+
+def compile_index(annotation_file, index_path, source_sha256):
+    """Compile gold CoNLL/BIO annotations into a binary index file
+
+    The file is written next to its final path and moved into place, so
+    concurrent workers never see a partial index.
+
+    Args:
+        annotation_file ([str]): Path to the gold CoNLL/BIO annotations
+        index_path ([str]): Path of the index file to write
+        source_sha256 ([str]): SHA-256 of the annotation file
+    """
+    vocabulary = TagVocabulary()
+    splits = []
+    tokens = bytearray()
+    token_offsets = [0]
+    tag_ids = []
+    sentence_offsets = [0]
+    sentence_splits = []
+    with open(annotation_file, encoding="utf-8", newline="\n") as f:
+        for split, sentence_tokens, sentence_tags, _ in read_sentences(f):
+            for token in sentence_tokens:
+                tokens += token.encode("utf-8")
+                token_offsets.append(len(tokens))
+            vocabulary.encode(sentence_tags, tag_ids)
+            sentence_offsets.append(len(tag_ids))
+            if split is not None and split not in splits:
+                splits.append(split)
+            sentence_splits.append(splits.index(split) if split is not None else -1)
+
+    tag_ids = np.array(tag_ids, dtype=np.int16)
+    sentence_offsets = np.array(sentence_offsets, dtype=np.int64)
+    span_starts, span_ends, span_types = extract_spans(
+        tag_ids, sentence_offsets[:-1], vocabulary
+    )
+    span_offsets = np.searchsorted(span_starts, sentence_offsets).astype(np.int64)
+    arrays = {
+        "tokens": np.frombuffer(bytes(tokens), dtype=np.uint8),
+        "token_offsets": np.array(token_offsets, dtype=np.int64),
+        "tag_ids": tag_ids,
+        "sentence_offsets": sentence_offsets,
+        "sentence_splits": np.array(sentence_splits, dtype=np.int8),
+        "span_starts": span_starts.astype(np.int64),
+        "span_ends": span_ends.astype(np.int64),
+        "span_types": span_types.astype(np.int16),
+        "span_offsets": span_offsets,
+    }
+
+    header = {
+        "source_sha256": source_sha256,
+        "tags": vocabulary.tags,
+        "splits": splits,
+        "arrays": {},
+    }
+    # Array offsets depend on the header size, so lay the arrays out after a
+    # generously padded header.
+    reserved = INDEX_ALIGNMENT * (
+        (len(json.dumps(header)) + 64 * len(arrays) + 2 * INDEX_ALIGNMENT)
+        // INDEX_ALIGNMENT
+    )
+    offset = len(INDEX_MAGIC) + 8 + reserved
+    for name, array in arrays.items():
+        header["arrays"][name] = (array.dtype.str, offset, len(array))
+        offset += -(-array.nbytes // INDEX_ALIGNMENT) * INDEX_ALIGNMENT
+    encoded_header = json.dumps(header).encode("utf-8").ljust(reserved)
+
+    directory = os.path.dirname(index_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(struct.pack("<Q", reserved))
+            f.write(encoded_header)
+            for name, array in arrays.items():
+                f.seek(header["arrays"][name][1])
+                f.write(array.tobytes())
+            f.truncate(offset)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def load_index(annotation_file, index_dir=None):
+    """Open the gold index of an annotation file, compiling it if needed
+
+    Index files are named after the SHA-256 of the annotation file, so editing
+    the annotations automatically leads to a fresh index.
+
+    Args:
+        annotation_file ([str]): Path to the gold CoNLL/BIO annotations
+        index_dir ([str], optional): Directory of the index files. Defaults to
+            `CACHE_DIR`.
+
+    Returns:
+        [GoldIndex]: Memory-mapped gold index
+    """
+    source_sha256 = file_sha256(annotation_file)
+    index_path = os.path.join(
+        index_dir or CACHE_DIR,
+        "{}.{}.v{}.idx".format(
+            os.path.basename(annotation_file), source_sha256, INDEX_VERSION
+        ),
+    )
+    if not os.path.exists(index_path):
+        compile_index(annotation_file, index_path, source_sha256)
+    return GoldIndex(index_path)
@@ -0,0 +1,117 @@
+import numpy as np
+
+from .tags import INSIDE, OUTSIDE
+
+
+def extract_spans(tag_ids, sentence_starts, vocabulary):
+    """Extract the entity spans of a batch of sentences
+
+    An `I-` tag that does not continue an entity of the same type opens a new
+    entity, as in the conlleval script. Entities never cross sentence
+    boundaries.
+
+    Args:
+        tag_ids ([np.ndarray]): Tag ids of all tokens of the batch
+        sentence_starts ([np.ndarray]): Index of the first token of every
+            sentence in `tag_ids`
+        vocabulary ([TagVocabulary]): Vocabulary the tags were encoded with
+
+    Returns:
+        [tuple]: (starts, ends, types) arrays with inclusive end indices,
+            ordered by start
+    """
+    prefixes = vocabulary.prefixes[tag_ids]
+    types = vocabulary.types[tag_ids]
+    inside = prefixes != OUTSIDE
+    continues = np.zeros(len(tag_ids), dtype=bool)
+    continues[1:] = (
+        inside[1:] & (prefixes[1:] == INSIDE) & inside[:-1] & (types[1:] == types[:-1])
+    )
+    continues[sentence_starts] = False
+    begins = inside & ~continues
+    ends = inside.copy()
+    ends[:-1] &= ~continues[1:]
+    return np.flatnonzero(begins), np.flatnonzero(ends), types[begins]
+
+
+def span_keys(starts, ends, types, num_tokens, num_types):
+    """Encode spans as sorted int64 keys, one key per (start, end, type)"""
+    starts = starts.astype(np.int64)
+    return (starts * num_tokens + ends) * num_types + types
+
+
+def span_sentences(starts, sentence_starts):
+    """Index of the sentence every span starts in"""
+    return np.searchsorted(sentence_starts, starts, side="right") - 1
+
+
+def match_spans(gold_spans, pred_spans, num_tokens, num_types):
+    """Find the predicted spans that exactly match a gold span
+
+    Spans of both sides are encoded as sorted integer keys and matched with a
+    binary search instead of per-sentence sets of tuples.
+
+    Args:
+        gold_spans ([tuple]): (starts, ends, types) arrays of the gold spans
+        pred_spans ([tuple]): (starts, ends, types) arrays of the predictions
+        num_tokens ([int]): Number of tokens the spans are drawn from
+        num_types ([int]): Number of entity types
+
+    Returns:
+        [np.ndarray]: Boolean mask over the predicted spans
+    """
+    gold_keys = span_keys(*gold_spans, num_tokens, num_types)
+    pred_keys = span_keys(*pred_spans, num_tokens, num_types)
+    if not len(gold_keys):
+        return np.zeros(len(pred_keys), dtype=bool)
+    positions = np.searchsorted(gold_keys, pred_keys)
+    np.minimum(positions, len(gold_keys) - 1, out=positions)
+    return gold_keys[positions] == pred_keys
+
+
+def count_batch(
+    gold_spans,
+    pred_tag_ids,
+    sentence_starts,
+    vocabulary,
+    sentence_groups=None,
+    num_groups=1,
+):
+    """Count span matches for a batch of sentences
+
+    Args:
+        gold_spans ([tuple]): (starts, ends, types) arrays of the gold spans of
+            the batch, relative to its first token
+        pred_tag_ids ([np.ndarray]): Predicted tag ids of all tokens of the
+            batch
+        sentence_starts ([np.ndarray]): Index of the first token of every
+            sentence
+        vocabulary ([TagVocabulary]): Vocabulary the tags were encoded with
+        sentence_groups ([np.ndarray], optional): Group, e.g. dataset split,
+            of every sentence. Defaults to None, which puts every sentence in
+            group 0.
+        num_groups ([int], optional): Number of groups. Defaults to 1.
+
+    Returns:
+        [np.ndarray]: (num_groups, num_types, 3) table of tp, fp and fn per
+            group and entity type
+    """
+    num_types = max(len(vocabulary.entity_types), 1)
+    pred_spans = extract_spans(pred_tag_ids, sentence_starts, vocabulary)
+    matched = match_spans(gold_spans, pred_spans, len(pred_tag_ids), num_types)
+    gold_bins = gold_spans[2].astype(np.int64)
+    pred_bins = pred_spans[2].astype(np.int64)
+    if sentence_groups is not None:
+        sentence_groups = np.asarray(sentence_groups, dtype=np.int64)
+        gold_bins += (
+            sentence_groups[span_sentences(gold_spans[0], sentence_starts)] * num_types
+        )
+        pred_bins += (
+            sentence_groups[span_sentences(pred_spans[0], sentence_starts)] * num_types
+        )
+    size = num_groups * num_types
+    tp = np.bincount(pred_bins[matched], minlength=size)
+    gold = np.bincount(gold_bins, minlength=size)
+    pred = np.bincount(pred_bins, minlength=size)
+    table = np.stack([tp, pred - tp, gold - tp], axis=1)
+    return table.reshape(num_groups, num_types, 3)
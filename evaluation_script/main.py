@@ -1,4 +1,137 @@
-import random
+import io
+import os
+
+import numpy as np
+
+from .bootstrap import BOOTSTRAP_SAMPLES, confidence_intervals
+from .cache import ResultCache
+from .conll import read_sentences
+from .delta import score_submission_delta
+from .formats import (
+    TAG_ID_FORMATS,
+    TEXT,
+    load_tag_ids,
+    open_text_submission,
+    sniff_format,
+)
+from .index import file_sha256, load_index
+from .parallel import score_submission_sharded
+from .scorer import (
+    f1_score,
+    score_submission,
+    score_tag_ids,
+    split_counts,
+    split_sentences,
+    summarize,
+)
+from .validation import validate_submission
+
+# Number of processes that score one submission, 1 scores it in-process
+NUM_WORKERS = int(os.environ.get("EVALUATION_WORKERS", 1))
+
+
+def split_result(sentence_counts, entity_types, bootstrap_samples):
+    """Leaderboard metrics and per-type F1 of one split with bootstrap intervals
+
+    Args:
+        sentence_counts ([np.ndarray]): (num_sentences, num_types, 3) tp, fp
+            and fn of every sentence of the split
+        entity_types ([list]): Entity type of every column
+        bootstrap_samples ([int]): Number of bootstrap resamples, 0 gives
+            intervals of zero width
+
+    Returns:
+        [dict]: "metrics" for the leaderboard and "entity_types" with the F1
+            and its interval of every entity type that occurs in the split
+    """
+    counts = sentence_counts.sum(axis=0)
+    (total_low, total_high), type_bounds = confidence_intervals(
+        sentence_counts, bootstrap_samples
+    )
+    metrics = summarize(counts)
+    metrics["Total_CI_Low"], metrics["Total_CI_High"] = total_low, total_high
+    type_f1 = 100.0 * f1_score(*counts.T)
+    per_type = {}
+    for type_id in np.flatnonzero(counts.any(axis=1)):
+        per_type[entity_types[type_id]] = {
+            "F1": float(type_f1[type_id]),
+            "CI_Low": float(type_bounds[0, type_id]),
+            "CI_High": float(type_bounds[1, type_id]),
+        }
+    return {"metrics": metrics, "entity_types": per_type}
+
+
+def score_splits(
+    gold_index,
+    user_submission_file,
+    splits,
+    num_workers=1,
+    cache=None,
+    bootstrap_samples=BOOTSTRAP_SAMPLES,
+):
+    """Compute the leaderboard metrics of a submission for several splits
+
+    Tag-id arrays (.npy, .npz, .h5) are scored directly, from their memory
+    map where the format allows one. CoNLL/BIO text, plain or compressed with
+    gzip or zip, is validated first, so malformed files are rejected before
+    any scoring work, and then read once, counting every sentence towards the
+    split it belongs to in the gold index. Only plain text files can be split
+    across worker processes.
+
+    With bootstrap resampling the counters are kept per sentence, so that the
+    confidence intervals come from the same single pass.
+
+    Args:
+        gold_index ([GoldIndex]): Compiled gold annotations
+        user_submission_file ([str]): Path to the submission
+        splits ([list]): Dataset split codenames, None for all sentences
+        num_workers ([int], optional): Number of worker processes. Defaults
+            to 1, which scores the submission in this process.
+        cache ([ResultCache], optional): Cache of sentence block counters for
+            in-process scoring. Defaults to None.
+        bootstrap_samples ([int], optional): Number of bootstrap resamples
+            of the confidence intervals. Defaults to `BOOTSTRAP_SAMPLES`.
+
+    Returns:
+        [list]: Result of every split from `split_result`, in the order of
+            `splits`
+    """
+    per_sentence = bootstrap_samples > 0
+    submission_format = sniff_format(user_submission_file)
+    if submission_format not in TAG_ID_FORMATS:
+        validate_submission(gold_index, user_submission_file)
+    if submission_format in TAG_ID_FORMATS:
+        tag_ids, tags = load_tag_ids(user_submission_file, submission_format)
+        counts, vocabulary = score_tag_ids(gold_index, tag_ids, tags, per_sentence)
+    elif num_workers > 1 and submission_format == TEXT:
+        counts, vocabulary = score_submission_sharded(
+            gold_index, user_submission_file, num_workers, per_sentence
+        )
+    elif cache is not None and cache.max_size:
+        counts, vocabulary = score_submission_delta(
+            gold_index, user_submission_file, cache, per_sentence
+        )
+    else:
+        with io.TextIOWrapper(
+            open_text_submission(user_submission_file, submission_format),
+            encoding="utf-8",
+            newline="\n",
+        ) as pred_file:
+            counts, vocabulary = score_submission(
+                gold_index, read_sentences(pred_file), per_sentence=per_sentence
+            )
+
+    results = []
+    for split in splits:
+        if per_sentence:
+            sentence_counts = split_sentences(counts, gold_index, split)
+        else:
+            # A single row of counters gives intervals of zero width
+            sentence_counts = split_counts(counts, gold_index, split)[None]
+        results.append(
+            split_result(sentence_counts, vocabulary.entity_types, bootstrap_samples)
+        )
+    return results
 
 
 def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwargs):
@@ -14,7 +147,12 @@ def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwarg
         `**kwargs`: keyword arguments that contains additional submission
         metadata that challenge hosts can use to send slack notification.
         You can access the submission metadata
-        with kwargs['submission_metadata']
+        with kwargs['submission_metadata']. `kwargs['num_workers']` overrides
+        the number of scoring processes set by EVALUATION_WORKERS.
+
+        Every split result also holds Total_CI_Low and Total_CI_High, the
+        bootstrap confidence interval of Total. The per-type F1 and its
+        interval are returned under output['submission_metadata'].
 
         Example: A sample submission metadata can be accessed like this:
         >>> print(kwargs['submission_metadata'])
@@ -40,41 +178,50 @@ def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwarg
         }
     """
     output = {}
+    num_workers = kwargs.get("num_workers", NUM_WORKERS)
+    gold_index = load_index(test_annotation_file)
+    submission_sha256 = file_sha256(user_submission_file)
+    cache = ResultCache()
+
+    def split_results(*splits):
+        # Identical resubmissions are served from the result cache
+        key = cache.key(
+            phase_codename,
+            gold_index.source_sha256,
+            submission_sha256,
+            splits,
+            BOOTSTRAP_SAMPLES,
+        )
+        return cache.fetch(
+            key,
+            lambda: score_splits(
+                gold_index, user_submission_file, splits, num_workers, cache
+            ),
+        )
+
     if phase_codename == "dev":
         print("Evaluating for Dev Phase")
-        output["result"] = [
-            {
-                "train_split": {
-                    "Metric1": random.randint(0, 99),
-                    "Metric2": random.randint(0, 99),
-                    "Metric3": random.randint(0, 99),
-                    "Total": random.randint(0, 99),
-                }
-            }
-        ]
+        (train_result,) = split_results(None)
+        output["result"] = [{"train_split": train_result["metrics"]}]
+        output["submission_metadata"] = {
+            "entity_types": {"train_split": train_result["entity_types"]}
+        }
         # To display the results in the result file
         output["submission_result"] = output["result"][0]["train_split"]
         print("Completed evaluation for Dev Phase")
     elif phase_codename == "test":
         print("Evaluating for Test Phase")
+        train_result, test_result = split_results("train_split", "test_split")
         output["result"] = [
-            {
-                "train_split": {
-                    "Metric1": random.randint(0, 99),
-                    "Metric2": random.randint(0, 99),
-                    "Metric3": random.randint(0, 99),
-                    "Total": random.randint(0, 99),
-                }
-            },
-            {
-                "test_split": {
-                    "Metric1": random.randint(0, 99),
-                    "Metric2": random.randint(0, 99),
-                    "Metric3": random.randint(0, 99),
-                    "Total": random.randint(0, 99),
-                }
-            },
+            {"train_split": train_result["metrics"]},
+            {"test_split": test_result["metrics"]},
         ]
+        output["submission_metadata"] = {
+            "entity_types": {
+                "train_split": train_result["entity_types"],
+                "test_split": test_result["entity_types"],
+            }
+        }
         # To display the results in the result file
         output["submission_result"] = output["result"][0]
         print("Completed evaluation for Test Phase")
@@ -0,0 +1,179 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .conll import count_sentences, read_sentences
+from .index import GoldIndex
+from .scorer import combine_counts, remap_counts, score_submission
+
+SHARD_SIZE = 8 << 20
+SHARD_BOUNDARIES = (b"\n\n", b"\n\r\n")
+
+_gold_index = None
+
+
+def find_boundary(f, position, file_size, block_size=1 << 16):
+    """Find the first sentence boundary at or after a byte position
+
+    Only blank lines are used as boundaries, so a shard never starts inside a
+    sentence.
+
+    Args:
+        f ([file]): Submission opened in binary mode
+        position ([int]): Byte position to start searching from
+        file_size ([int]): Size of the submission in bytes
+        block_size ([int], optional): Bytes read per step. Defaults to 64 KiB.
+
+    Returns:
+        [int]: Byte position right after a blank line, or the file size
+    """
+    f.seek(position)
+    tail = b""
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return file_size
+        data = tail + block
+        matches = [data.find(boundary) for boundary in SHARD_BOUNDARIES]
+        matches = [
+            match + len(boundary)
+            for match, boundary in zip(matches, SHARD_BOUNDARIES)
+            if match >= 0
+        ]
+        if matches:
+            return position - len(tail) + min(matches)
+        position += len(block)
+        tail = data[-2:]
+
+
+def plan_shards(user_submission_file, num_workers, shard_size=SHARD_SIZE):
+    """Split a submission into byte ranges that start at sentence boundaries
+
+    Args:
+        user_submission_file ([str]): Path to the submitted CoNLL/BIO file
+        num_workers ([int]): Number of worker processes
+        shard_size ([int], optional): Upper bound of the shard size in bytes.
+            Defaults to `SHARD_SIZE`.
+
+    Returns:
+        [list]: (start, end) byte ranges covering the whole file
+    """
+    file_size = os.path.getsize(user_submission_file)
+    shard_size = max(1, min(shard_size, -(-file_size // num_workers)))
+    shards = []
+    start = 0
+    with open(user_submission_file, "rb") as f:
+        while start < file_size:
+            end = find_boundary(f, start + shard_size, file_size)
+            shards.append((start, end))
+            start = end
+    return shards
+
+
+def read_shard(user_submission_file, shard):
+    with open(user_submission_file, "rb") as f:
+        f.seek(shard[0])
+        return f.read(shard[1] - shard[0])
+
+
+def shard_lines(data):
+    # Only "\n" ends a line, as in the validator
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline="\n")
+
+
+def init_worker(index_path):
+    global _gold_index
+    _gold_index = GoldIndex(index_path)
+
+
+def count_shard(user_submission_file, shard):
+    """Count the sentences and lines of one shard"""
+    data = read_shard(user_submission_file, shard)
+    return count_sentences(shard_lines(data)), data.count(b"\n")
+
+
+def score_shard(
+    user_submission_file,
+    shard,
+    first_sentence,
+    last_sentence,
+    first_line,
+    per_sentence=False,
+):
+    """Score one shard against the gold index of the worker process
+
+    Returns:
+        [tuple]: ((num_groups, num_types, 3) table of tp, fp and fn, or one
+            row per sentence with `per_sentence`, entity type names)
+    """
+    lines = shard_lines(read_shard(user_submission_file, shard))
+    counts, vocabulary = score_submission(
+        _gold_index,
+        read_sentences(lines, first_line=first_line),
+        first_sentence=first_sentence,
+        last_sentence=last_sentence,
+        per_sentence=per_sentence,
+    )
+    return counts, vocabulary.entity_types
+
+
+def score_submission_sharded(
+    gold_index, user_submission_file, num_workers=2, per_sentence=False
+):
+    """Score a submission with a pool of worker processes
+
+    The submission is cut into byte ranges at blank lines. A first pass counts
+    the sentences of every shard to find the gold sentence it starts at, and a
+    second pass scores the shards. The per-type counters are additive, so the
+    merged counters equal those of `score_submission` on the whole file.
+
+    Args:
+        gold_index ([GoldIndex]): Compiled gold annotations
+        user_submission_file ([str]): Path to the submitted CoNLL/BIO file
+        num_workers ([int], optional): Number of worker processes. Defaults
+            to 2.
+        per_sentence ([bool], optional): Whether to count every sentence in
+            its own row instead of in its split group. Defaults to False.
+
+    Returns:
+        [tuple]: ((num_groups, num_types, 3) table of tp, fp and fn per
+            split group and entity type, or (num_sentences, num_types, 3)
+            with `per_sentence`, TagVocabulary)
+    """
+    shards = plan_shards(user_submission_file, num_workers)
+    with ProcessPoolExecutor(
+        max_workers=num_workers, initializer=init_worker, initargs=(gold_index.path,)
+    ) as executor:
+        sizes = list(
+            executor.map(count_shard, [user_submission_file] * len(shards), shards)
+        )
+        total = sum(num_sentences for num_sentences, _ in sizes)
+        if total > gold_index.num_sentences:
+            raise ValueError("The submission has more sentences than the annotations")
+        if total < gold_index.num_sentences:
+            raise ValueError(
+                "The submission ends after {} sentences, expected {}".format(
+                    total, gold_index.num_sentences
+                )
+            )
+
+        futures = []
+        first_sentence, first_line = 0, 1
+        for shard, (num_sentences, num_lines) in zip(shards, sizes):
+            futures.append(
+                executor.submit(
+                    score_shard,
+                    user_submission_file,
+                    shard,
+                    first_sentence,
+                    first_sentence + num_sentences,
+                    first_line,
+                    per_sentence,
+                )
+            )
+            first_sentence += num_sentences
+            first_line += num_lines
+
+        vocabulary = gold_index.vocabulary()
+        tables = [remap_counts(*future.result(), vocabulary) for future in futures]
+    return combine_counts(tables, gold_index.num_groups, per_sentence), vocabulary
@@ -0,0 +1,391 @@
+import numpy as np
+
+from .kernel import count_batch
+from .tags import canonical_tags
+
+BATCH_SIZE = 4096
+
+
+def pad_types(table, num_types):
+    """Widen a counter table with zero columns for entity types it lacks"""
+    missing = num_types - table.shape[1]
+    if missing <= 0:
+        return table
+    return np.concatenate(
+        [table, np.zeros((len(table), missing, 3), dtype=table.dtype)], axis=1
+    )
+
+
+def combine_counts(tables, num_groups, per_sentence=False):
+    """Combine the counter tables of consecutive batches
+
+    The vocabulary can grow between batches, so tables of later batches may
+    have more entity types than earlier ones.
+
+    Args:
+        tables ([list]): (num_groups, num_types, 3) tables of tp, fp and fn,
+            or (num_sentences, num_types, 3) tables in sentence order
+        num_groups ([int]): Number of split groups
+        per_sentence ([bool], optional): Whether the tables hold one row per
+            sentence, which are stacked instead of summed. Defaults to False.
+
+    Returns:
+        [np.ndarray]: Combined counters
+    """
+    num_types = max([0] + [table.shape[1] for table in tables])
+    tables = [pad_types(table, num_types) for table in tables]
+    if per_sentence:
+        if not tables:
+            return np.zeros((0, num_types, 3), dtype=np.int64)
+        return np.concatenate(tables)
+    counts = np.zeros((num_groups, num_types, 3), dtype=np.int64)
+    for table in tables:
+        counts += table
+    return counts
+
+
+def remap_counts(table, entity_types, vocabulary):
+    """Reorder counters computed with another vocabulary
+
+    Args:
+        table ([np.ndarray]): (num_rows, num_types, 3) counters
+        entity_types ([list]): Entity type of every column of `table`
+        vocabulary ([TagVocabulary]): Vocabulary to reorder the columns for,
+            which registers types it does not know yet
+
+    Returns:
+        [np.ndarray]: Counters with the columns of `vocabulary`
+    """
+    type_ids = [vocabulary.type_id(entity_type) for entity_type in entity_types]
+    remapped = np.zeros((len(table), len(vocabulary.entity_types), 3), dtype=np.int64)
+    remapped[:, type_ids] = table[:, : len(type_ids)]
+    return remapped
+
+
+def group_counts(sentence_counts, gold_index):
+    """Sum per-sentence counters into the split groups of the gold index
+
+    Args:
+        sentence_counts ([np.ndarray]): (num_sentences, num_types, 3) counters
+        gold_index ([GoldIndex]): Compiled gold annotations
+
+    Returns:
+        [np.ndarray]: (num_groups, num_types, 3) counters
+    """
+    groups = gold_index.sentence_groups(0, len(sentence_counts))
+    counts = np.zeros(
+        (gold_index.num_groups,) + sentence_counts.shape[1:], dtype=np.int64
+    )
+    for group in range(gold_index.num_groups):
+        counts[group] = sentence_counts[groups == group].sum(axis=0)
+    return counts
+
+
+def split_sentences(sentence_counts, gold_index, split=None):
+    """Select the per-sentence counters of one dataset split
+
+    Args:
+        sentence_counts ([np.ndarray]): (num_sentences, num_types, 3) counters
+        gold_index ([GoldIndex]): Compiled gold annotations
+        split ([str], optional): Dataset split codename. Defaults to None,
+            which selects every sentence.
+
+    Returns:
+        [np.ndarray]: Counters of the sentences of the split
+    """
+    if split is None:
+        return sentence_counts
+    if split not in gold_index.splits:
+        return sentence_counts[:0]
+    groups = gold_index.sentence_groups(0, len(sentence_counts))
+    return sentence_counts[groups == gold_index.split_id(split) + 1]
+
+
+def split_counts(counts, gold_index, split=None):
+    """Select the counters of one dataset split
+
+    Args:
+        counts ([np.ndarray]): (num_groups, num_types, 3) counters from
+            `score_submission`
+        gold_index ([GoldIndex]): Compiled gold annotations
+        split ([str], optional): Dataset split codename. Defaults to None,
+            which sums up every sentence.
+
+    Returns:
+        [np.ndarray]: (num_types, 3) table of tp, fp and fn
+    """
+    if split is None:
+        return counts.sum(axis=0)
+    if split not in gold_index.splits:
+        return np.zeros(counts.shape[1:], dtype=np.int64)
+    return counts[gold_index.split_id(split) + 1]
+
+
+def score_submission(
+    gold_index,
+    pred_sentences,
+    vocabulary=None,
+    first_sentence=0,
+    last_sentence=None,
+    per_sentence=False,
+):
+    """Count span matches of a submission against a gold annotation index
+
+    The submission is consumed one sentence at a time and scored in batches of
+    `BATCH_SIZE` sentences against the precomputed gold spans, so memory use
+    does not grow with the size of the corpus. Every sentence is counted in
+    the group of its dataset split, so one pass scores all splits at once.
+
+    Args:
+        gold_index ([GoldIndex]): Compiled gold annotations
+        pred_sentences ([iterable]): Submitted sentences from `read_sentences`
+        vocabulary ([TagVocabulary], optional): Tag vocabulary to encode
+            with. Defaults to the vocabulary of the gold index.
+        first_sentence ([int], optional): Gold index of the first submitted
+            sentence. Defaults to 0.
+        last_sentence ([int], optional): Gold index after the last submitted
+            sentence. Defaults to the number of gold sentences.
+        per_sentence ([bool], optional): Whether to count every sentence in
+            its own row instead of in its split group. Defaults to False.
+
+    Returns:
+        [tuple]: ((num_groups, num_types, 3) table of tp, fp and fn per
+            split group and entity type, or (num_sentences, num_types, 3)
+            with `per_sentence`, TagVocabulary)
+    """
+    vocabulary = vocabulary or gold_index.vocabulary()
+    if last_sentence is None:
+        last_sentence = gold_index.num_sentences
+    tables = []
+    batch = SentenceBatch(first_sentence)
+    for index, (_, _, pred_tags, line_number) in enumerate(
+        pred_sentences, first_sentence
+    ):
+        if index == last_sentence:
+            raise ValueError("The submission has more sentences than the annotations")
+        batch.add(pred_tags, line_number, vocabulary)
+        if len(batch) == BATCH_SIZE:
+            tables.append(batch.count(gold_index, vocabulary, per_sentence))
+            batch = SentenceBatch(index + 1)
+    if batch.first + len(batch) < last_sentence:
+        raise ValueError(
+            "The submission ends after {} sentences, expected {}".format(
+                batch.first + len(batch), gold_index.num_sentences
+            )
+        )
+    if len(batch):
+        tables.append(batch.count(gold_index, vocabulary, per_sentence))
+    return combine_counts(tables, gold_index.num_groups, per_sentence), vocabulary
+
+
+class SentenceBatch:
+    def __init__(self, first):
+        """Encoded predictions of consecutive sentences
+
+        Args:
+            first ([int]): Index of the first sentence of the batch
+        """
+        self.first = first
+        self.tag_ids = []
+        self.sentence_starts = []
+        self.line_numbers = []
+
+    def __len__(self):
+        return len(self.sentence_starts)
+
+    def add(self, tags, line_number, vocabulary):
+        self.sentence_starts.append(len(self.tag_ids))
+        self.line_numbers.append(line_number)
+        vocabulary.encode(tags, self.tag_ids)
+
+    def count(self, gold_index, vocabulary, per_sentence=False):
+        """Score the batch against the gold spans of the same sentences
+
+        Args:
+            gold_index ([GoldIndex]): Compiled gold annotations
+            vocabulary ([TagVocabulary]): Vocabulary the tags were encoded with
+            per_sentence ([bool], optional): Whether to count every sentence
+                in its own row. Defaults to False.
+
+        Returns:
+            [np.ndarray]: (num_groups, num_types, 3) table of tp, fp and fn per
+                split group and entity type, or one row per sentence
+        """
+        first, last = self.first, self.first + len(self)
+        sentence_offsets = gold_index.sentence_offsets[first : last + 1]
+        sentence_starts = np.array(self.sentence_starts, dtype=np.int64)
+        pred_lengths = np.diff(np.append(sentence_starts, len(self.tag_ids)))
+        mismatches = np.flatnonzero(pred_lengths != np.diff(sentence_offsets))
+        if len(mismatches):
+            position = mismatches[0]
+            raise ValueError(
+                "Sentence {} on line {} of the submission has {} tokens, expected {}".format(
+                    first + position + 1,
+                    self.line_numbers[position],
+                    pred_lengths[position],
+                    sentence_offsets[position + 1] - sentence_offsets[position],
+                )
+            )
+
+        return count_range(
+            gold_index,
+            first,
+            last,
+            np.array(self.tag_ids, dtype=np.int16),
+            sentence_starts,
+            vocabulary,
+            per_sentence,
+        )
+
+
+def count_range(
+    gold_index,
+    first,
+    last,
+    pred_tag_ids,
+    sentence_starts,
+    vocabulary,
+    per_sentence=False,
+):
+    """Score the predicted tags of a range of sentences against the gold spans
+
+    Args:
+        gold_index ([GoldIndex]): Compiled gold annotations
+        first ([int]): Index of the first sentence
+        last ([int]): Index after the last sentence
+        pred_tag_ids ([np.ndarray]): Predicted tag ids of all tokens of the
+            range, with the gold sentence lengths
+        sentence_starts ([np.ndarray]): Offset of every sentence in
+            `pred_tag_ids`
+        vocabulary ([TagVocabulary]): Vocabulary the tags were encoded with
+        per_sentence ([bool], optional): Whether to count every sentence in
+            its own row. Defaults to False.
+
+    Returns:
+        [np.ndarray]: (num_groups, num_types, 3) table of tp, fp and fn per
+            split group and entity type, or one row per sentence
+    """
+    if per_sentence:
+        sentence_groups, num_groups = np.arange(last - first), last - first
+    else:
+        sentence_groups = gold_index.sentence_groups(first, last)
+        num_groups = gold_index.num_groups
+    token_offset = gold_index.sentence_offsets[first]
+    span_range = slice(*gold_index.span_offsets[[first, last]])
+    gold_spans = (
+        gold_index.span_starts[span_range] - token_offset,
+        gold_index.span_ends[span_range] - token_offset,
+        gold_index.span_types[span_range],
+    )
+    return count_batch(
+        gold_spans,
+        pred_tag_ids,
+        sentence_starts,
+        vocabulary,
+        sentence_groups,
+        num_groups,
+    )
+
+
+def score_tag_ids(gold_index, tag_ids, tags=None, per_sentence=False):
+    """Count span matches of a submission given as an array of tag ids
+
+    The array holds one tag id per gold token, in corpus order. It is read in
+    slices of `BATCH_SIZE` sentences, so memory-mapped arrays are never loaded
+    at once and no text is parsed.
+
+    Args:
+        gold_index ([GoldIndex]): Compiled gold annotations
+        tag_ids ([np.ndarray]): Sliceable 1-D array of integer tag ids
+        tags ([list], optional): Tag names the ids index into. Defaults to
+            `canonical_tags` of the gold entity types.
+        per_sentence ([bool], optional): Whether to count every sentence in
+            its own row instead of in its split group. Defaults to False.
+
+    Returns:
+        [tuple]: ((num_groups, num_types, 3) table of tp, fp and fn per
+            split group and entity type, or (num_sentences, num_types, 3)
+            with `per_sentence`, TagVocabulary)
+    """
+    vocabulary = gold_index.vocabulary()
+    known_tags = canonical_tags(vocabulary.entity_types)
+    if tags is None:
+        tags = known_tags
+    lookup = []
+    for tag in tags:
+        if tag not in known_tags:
+            raise ValueError("Unknown tag {!r} in the submission".format(tag))
+        lookup.append(
+            vocabulary.tag_ids[tag]
+            if tag in vocabulary.tag_ids
+            else vocabulary.add(tag)
+        )
+    lookup = np.array(lookup, dtype=np.int16)
+
+    if len(tag_ids.shape) != 1 or tag_ids.dtype.kind not in "iu":
+        raise ValueError("The tag ids of the submission must be a 1-D integer array")
+    sentence_offsets = gold_index.sentence_offsets
+    if len(tag_ids) != sentence_offsets[-1]:
+        raise ValueError(
+            "The submission has {} tags, expected {}".format(
+                len(tag_ids), sentence_offsets[-1]
+            )
+        )
+
+    tables = []
+    for first in range(0, gold_index.num_sentences, BATCH_SIZE):
+        last = min(first + BATCH_SIZE, gold_index.num_sentences)
+        token_range = slice(sentence_offsets[first], sentence_offsets[last])
+        batch = np.asarray(tag_ids[token_range]).astype(np.int64)
+        invalid = np.flatnonzero((batch < 0) | (batch >= len(lookup)))
+        if len(invalid):
+            raise ValueError(
+                "Tag id {} of token {} of the submission is out of range".format(
+                    batch[invalid[0]], token_range.start + invalid[0] + 1
+                )
+            )
+        tables.append(
+            count_range(
+                gold_index,
+                first,
+                last,
+                lookup[batch],
+                sentence_offsets[first:last] - token_range.start,
+                vocabulary,
+                per_sentence,
+            )
+        )
+    return combine_counts(tables, gold_index.num_groups, per_sentence), vocabulary
+
+
+def f1_score(tp, fp, fn):
+    """Vectorized F1, 0 where there are no gold and no predicted spans"""
+    tp, fp, fn = (np.asarray(count, dtype=np.float64) for count in (tp, fp, fn))
+    denominator = 2 * tp + fp + fn
+    return np.divide(
+        2 * tp, denominator, out=np.zeros_like(denominator), where=denominator > 0
+    )
+
+
+def summarize(counts):
+    """Turn per-type counters into the leaderboard metrics
+
+    Metric1 is the micro precision, Metric2 the micro recall, Metric3 the
+    macro F1 over entity types and Total the micro F1, all in percent. Entity
+    types without any gold or predicted span do not enter the macro average.
+
+    Args:
+        counts ([np.ndarray]): (num_types, 3) table of tp, fp and fn
+
+    Returns:
+        [dict]: Leaderboard metrics
+    """
+    counts = counts[counts.any(axis=1)]
+    tp, fp, fn = (int(total) for total in counts.sum(axis=0))
+    macro_f1 = float(f1_score(*counts.T).mean()) if len(counts) else 0.0
+    return {
+        "Metric1": 100.0 * tp / (tp + fp) if tp + fp else 0.0,
+        "Metric2": 100.0 * tp / (tp + fn) if tp + fn else 0.0,
+        "Metric3": 100.0 * macro_f1,
+        "Total": 100.0 * float(f1_score(tp, fp, fn)),
+    }
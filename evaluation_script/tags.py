@@ -0,0 +1,104 @@
+import numpy as np
+
+OUTSIDE_TAG = "O"
+
+OUTSIDE = 0
+BEGIN = 1
+INSIDE = 2
+
+PREFIXES = {"B": BEGIN, "I": INSIDE}
+
+
+class TagVocabulary:
+    def __init__(self, tags=()):
+        """Compact integer encoding of BIO tags
+
+        Tag id 0 is always the `O` tag. Every other tag gets the next free id
+        the first time it is seen, and its entity type gets the next free type
+        id. The `prefixes` and `types` arrays map a tag id to its BIO prefix
+        and entity type id (-1 for `O`).
+
+        Args:
+            tags ([list], optional): Tags to register up front, in id order
+                and without the `O` tag. Defaults to ().
+        """
+        self.tag_ids = {OUTSIDE_TAG: OUTSIDE}
+        self.tags = [OUTSIDE_TAG]
+        self.type_ids = {}
+        self.entity_types = []
+        self._prefixes = [OUTSIDE]
+        self._types = [-1]
+        self.prefixes = np.array(self._prefixes, dtype=np.int8)
+        self.types = np.array(self._types, dtype=np.int16)
+        for tag in tags:
+            self.add(tag)
+
+    def __len__(self):
+        return len(self.tag_ids)
+
+    def add(self, tag):
+        """Register a new tag
+
+        Args:
+            tag ([str]): BIO tag such as `B-Library`
+
+        Returns:
+            [int]: Id of the tag
+        """
+        prefix, _, entity_type = tag.partition("-")
+        if prefix not in PREFIXES or not entity_type:
+            raise ValueError("Invalid BIO tag {!r}".format(tag))
+        type_id = self.type_id(entity_type)
+        tag_id = len(self.tag_ids)
+        if tag_id > np.iinfo(np.int16).max:
+            raise ValueError("Too many distinct tags")
+        self.tag_ids[tag] = tag_id
+        self.tags.append(tag)
+        self._prefixes.append(PREFIXES[prefix])
+        self._types.append(type_id)
+        self.prefixes = np.array(self._prefixes, dtype=np.int8)
+        self.types = np.array(self._types, dtype=np.int16)
+        return tag_id
+
+    def type_id(self, entity_type):
+        """Id of an entity type, registering the type if it is new"""
+        if entity_type not in self.type_ids:
+            self.type_ids[entity_type] = len(self.entity_types)
+            self.entity_types.append(entity_type)
+        return self.type_ids[entity_type]
+
+    def encode(self, tags, out):
+        """Append the ids of a sequence of tags to a list
+
+        Args:
+            tags ([list]): BIO tags
+            out ([list]): List the tag ids are appended to
+        """
+        size = len(out)
+        try:
+            out.extend(map(self.tag_ids.__getitem__, tags))
+        except KeyError:
+            del out[size:]
+            out.extend(
+                self.tag_ids[tag] if tag in self.tag_ids else self.add(tag)
+                for tag in tags
+            )
+
+
+def canonical_tags(entity_types):
+    """Every valid tag of a set of entity types in a fixed order
+
+    The `O` tag comes first, followed by the `B-` and `I-` tag of every entity
+    type in alphabetical order. Tag-id array submissions index into this list.
+
+    Args:
+        entity_types ([list]): Entity type names
+
+    Returns:
+        [list]: Tags
+    """
+    return [OUTSIDE_TAG] + [
+        "{}-{}".format(prefix, entity_type)
+        for entity_type in sorted(entity_types)
+        for prefix in PREFIXES
+    ]
@@ -0,0 +1,282 @@
+import collections
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .blocks import classify_lines, gather, iter_blocks, split_columns
+from .formats import open_text_submission
+from .tags import canonical_tags
+
+# Submissions validated in this process ("count") and their "seconds"
+VALIDATIONS = collections.Counter()
+
+
+class SubmissionValidator:
+    def __init__(self, gold_index):
+        """Streaming structural check of a submission against the gold index
+
+        Blocks of the submission are checked with NumPy, without parsing the
+        lines one by one: every sentence must have as many tokens as its gold
+        sentence, every token must match the gold token text and every tag
+        must be `O` or a B/I tag of a gold entity type. The first problem in
+        file order is raised as a ValueError.
+
+        Args:
+            gold_index ([GoldIndex]): Compiled gold annotations
+        """
+        self.gold_index = gold_index
+        tags = canonical_tags(gold_index.vocabulary().entity_types)
+        # Tags are compared as fixed-width rows of 64 bit words, one byte
+        # wider than the longest known tag so that longer tags never match.
+        width = max(len(tag.encode("utf-8")) for tag in tags) + 1
+        self.tag_width = -(-width // 8) * 8
+        rows = np.zeros((len(tags), self.tag_width), dtype=np.uint8)
+        for row, tag in zip(rows, tags):
+            encoded = tag.encode("utf-8")
+            row[: len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        self.tag_rows = rows.view(np.uint64)
+        keys = self.tag_keys(self.tag_rows)
+        order = np.argsort(keys)
+        self.tag_rows, self.tag_key_table = self.tag_rows[order], keys[order]
+        self.line_number = 1
+        self.num_sentences = 0
+        self.in_sentence = False
+        self.length = 0
+        self.sentence_line = None
+        # First token or tag error of the sentence that is still open, which
+        # only counts if the sentence has the right length
+        self.pending = None
+
+    def feed(self, data):
+        """Check the next block of the submission
+
+        Args:
+            data ([bytes]): Complete lines, each ending with a newline
+        """
+        starts, is_token = classify_lines(data)
+        first_line = self.line_number
+        self.line_number += len(starts)
+        if self.in_sentence and not is_token[0]:
+            self.close(self.num_sentences - 1, self.length, self.sentence_line)
+            self.in_sentence = False
+        lines = np.flatnonzero(is_token)
+        if not len(lines):
+            return
+
+        previous = np.empty_like(is_token)
+        previous[0] = self.in_sentence
+        previous[1:] = is_token[:-1]
+        sentences = self.num_sentences - 1 + np.cumsum((is_token & ~previous)[lines])
+        first_sentence = int(sentences[0])
+        sentence_firsts = np.flatnonzero(np.diff(sentences, prepend=first_sentence - 1))
+        lengths = np.diff(np.append(sentence_firsts, len(lines)))
+        positions = np.arange(len(lines)) - np.repeat(sentence_firsts, lengths)
+        start_lines = first_line + lines[sentence_firsts]
+        if self.in_sentence:
+            positions[: lengths[0]] += self.length
+            lengths[0] += self.length
+            start_lines[0] = self.sentence_line
+
+        # (line_number, priority, message) of the problems in this block, a
+        # wrong sentence length goes before the token errors it causes
+        errors = []
+        sentence_offsets = self.gold_index.sentence_offsets
+        num_known = max(
+            0, min(len(lengths), len(sentence_offsets) - 1 - first_sentence)
+        )
+        if num_known < len(lengths):
+            errors.append(
+                (
+                    start_lines[num_known],
+                    0,
+                    "The submission has more sentences than the annotations, "
+                    "sentence {} starts on line {}".format(
+                        first_sentence + num_known + 1, start_lines[num_known]
+                    ),
+                )
+            )
+        gold_offsets = sentence_offsets[first_sentence : first_sentence + num_known + 1]
+        gold_lengths = np.diff(gold_offsets)
+        # The last sentence may go on in the next block
+        num_closed = min(num_known, len(lengths) - int(is_token[-1]))
+        mismatches = np.flatnonzero(lengths[:num_closed] != gold_lengths[:num_closed])
+        if len(mismatches):
+            position = mismatches[0]
+            errors.append(
+                (
+                    start_lines[position],
+                    0,
+                    self.length_error(
+                        first_sentence + position,
+                        start_lines[position],
+                        lengths[position],
+                    ),
+                )
+            )
+
+        # Token texts and tags are only compared inside the gold sentences
+        relative = sentences - first_sentence
+        checked = np.flatnonzero(relative < num_known)
+        checked = checked[positions[checked] < gold_lengths[relative[checked]]]
+        if len(checked):
+            gold_tokens = gold_offsets[relative[checked]] + positions[checked]
+            errors.extend(
+                self.check_lines(data, starts, lines[checked], gold_tokens, first_line)
+            )
+
+        if self.pending is not None and num_closed:
+            # The sentence of the pending error ended in this block
+            errors.append(self.pending)
+            self.pending = None
+        if is_token[-1] and num_known == len(lengths):
+            deferred = [
+                error for error in errors if error[1] and error[0] >= start_lines[-1]
+            ]
+            if deferred:
+                errors = [error for error in errors if error not in deferred]
+                self.pending = min(deferred + [self.pending or deferred[0]])
+        if errors:
+            raise ValueError(min(errors)[2])
+        self.num_sentences = first_sentence + len(lengths)
+        self.in_sentence = bool(is_token[-1])
+        self.length = int(lengths[-1])
+        self.sentence_line = int(start_lines[-1])
+
+    def check_lines(self, data, starts, lines, gold_tokens, first_line):
+        """Compare the token texts and tags of some lines with the gold index
+
+        Returns:
+            [list]: (line_number, priority, message) of the first bad token
+                and the first unknown tag, if any
+        """
+        buf = np.frombuffer(data, dtype=np.uint8)
+        token_starts, token_ends, tag_starts, tag_ends = split_columns(
+            data, starts, lines
+        )
+        errors = []
+
+        token_offsets = self.gold_index.token_offsets
+        gold_starts = token_offsets[gold_tokens]
+        gold_lengths = token_offsets[gold_tokens + 1] - gold_starts
+        token_lengths = token_ends - token_starts
+        equal = token_lengths == gold_lengths
+        same_length = np.flatnonzero(equal)
+        if len(same_length):
+            lengths = token_lengths[same_length]
+            same_bytes = gather(buf, token_starts[same_length], lengths) == gather(
+                self.gold_index.tokens, gold_starts[same_length], lengths
+            )
+            equal[same_length] = np.logical_and.reduceat(
+                same_bytes, np.cumsum(lengths) - lengths
+            )
+        bad_tokens = np.flatnonzero(~equal)
+        if len(bad_tokens):
+            position = bad_tokens[0]
+            line_number = first_line + int(lines[position])
+            token = bytes(data[token_starts[position] : token_ends[position]])
+            gold_token = self.gold_index.tokens[
+                gold_starts[position] : gold_starts[position] + gold_lengths[position]
+            ].tobytes()
+            errors.append(
+                (
+                    line_number,
+                    1,
+                    "Token {!r} on line {} of the submission does not match the "
+                    "gold token {!r}".format(
+                        token.decode("utf-8", "replace"),
+                        line_number,
+                        gold_token.decode("utf-8", "replace"),
+                    ),
+                )
+            )
+
+        tag_lengths = tag_ends - tag_starts
+        padded = np.concatenate([buf, np.zeros(self.tag_width, dtype=np.uint8)])
+        windows = sliding_window_view(padded, self.tag_width)[tag_starts]
+        np.multiply(
+            windows, np.arange(self.tag_width) < tag_lengths[:, None], out=windows
+        )
+        rows = windows.view(np.uint64)
+        found = np.searchsorted(self.tag_key_table, self.tag_keys(rows))
+        found = np.minimum(found, len(self.tag_rows) - 1)
+        known = (self.tag_rows[found] == rows).all(axis=1)
+        unknown = np.flatnonzero(~known)
+        if len(unknown):
+            position = unknown[0]
+            line_number = first_line + int(lines[position])
+            tag = bytes(data[tag_starts[position] : tag_ends[position]])
+            errors.append(
+                (
+                    line_number,
+                    1,
+                    "Unknown tag {!r} on line {} of the submission".format(
+                        tag.decode("utf-8", "replace"), line_number
+                    ),
+                )
+            )
+        return errors
+
+    @staticmethod
+    def tag_keys(rows):
+        """Mix the 64 bit words of fixed-width tag rows into one sortable key"""
+        keys = np.zeros(len(rows), dtype=np.uint64)
+        for column in range(rows.shape[1]):
+            keys *= np.uint64(1000003)
+            keys ^= rows[:, column]
+        return keys
+
+    def close(self, sentence, length, line_number):
+        """Check the length of a sentence that ended at a block boundary"""
+        sentence_offsets = self.gold_index.sentence_offsets
+        expected = sentence_offsets[sentence + 1] - sentence_offsets[sentence]
+        if length != expected:
+            raise ValueError(self.length_error(sentence, line_number, length))
+        if self.pending is not None:
+            raise ValueError(self.pending[2])
+
+    def length_error(self, sentence, line_number, length):
+        sentence_offsets = self.gold_index.sentence_offsets
+        return "Sentence {} on line {} of the submission has {} tokens, expected {}".format(
+            sentence + 1,
+            line_number,
+            length,
+            sentence_offsets[sentence + 1] - sentence_offsets[sentence],
+        )
+
+    def finish(self):
+        """Check the end of the submission after the last block"""
+        if self.in_sentence:
+            self.close(self.num_sentences - 1, self.length, self.sentence_line)
+            self.in_sentence = False
+        if self.num_sentences < self.gold_index.num_sentences:
+            raise ValueError(
+                "The submission ends after {} sentences, expected {}".format(
+                    self.num_sentences, self.gold_index.num_sentences
+                )
+            )
+
+
+def validate_submission(gold_index, user_submission_file):
+    """Check the structure of a submission before scoring it
+
+    This reads the submission once with vectorized checks, which takes a
+    fraction of the scoring time, and stops at the first mismatch.
+
+    Args:
+        gold_index ([GoldIndex]): Compiled gold annotations
+        user_submission_file ([str]): Path to the submitted CoNLL/BIO file
+
+    Raises:
+        ValueError: With the line and sentence of the first problem
+    """
+    start = time.perf_counter()
+    try:
+        validator = SubmissionValidator(gold_index)
+        with open_text_submission(user_submission_file) as f:
+            for data in iter_blocks(f):
+                validator.feed(data)
+        validator.finish()
+    finally:
+        VALIDATIONS["count"] += 1
+        VALIDATIONS["seconds"] += time.perf_counter() - start
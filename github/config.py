@@ -20,7 +20,7 @@ IGNORE_FILES = [
     "challenge_config.zip",
     "README.md",
     "run.sh",
-    "submission.json",
+    "submission.txt",
 ]
 CHALLENGE_ZIP_FILE_PATH = "challenge_config.zip"
 GITHUB_REPOSITORY = os.getenv("GITHUB_REPOSITORY")
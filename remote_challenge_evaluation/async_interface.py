@@ -0,0 +1,182 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from evaluation_script_starter import (
+    HTTP_BACKOFF_FACTOR,
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_SIZE,
+    RETRY_STATUSES,
+    URLS,
+    url_key,
+)
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEvalAI_Interface:
+    def __init__(
+        self,
+        AUTH_TOKEN,
+        EVALAI_API_SERVER,
+        QUEUE_NAME,
+        CHALLENGE_PK,
+        pool_size=HTTP_POOL_SIZE,
+        max_retries=HTTP_MAX_RETRIES,
+    ):
+        """Class to call the EvalAI backend from an asyncio event loop
+
+        It has the same methods as `EvalAI_Interface`, as coroutines. All
+        calls share one pooled keep-alive aiohttp session, which is opened on
+        the first call and closed by `close` or at the end of an
+        `async with` block.
+
+        Args:
+            AUTH_TOKEN ([str]): The authentication token corresponding to EvalAI
+            EVALAI_API_SERVER ([str]): It should be set to https://eval.ai for the production server
+            QUEUE_NAME ([str]): Unique queue name corresponding to every challenge
+            CHALLENGE_PK ([int]): Primary key corresponding to a challenge
+            pool_size ([int], optional): Connections kept open. Defaults to
+                `HTTP_POOL_SIZE`.
+            max_retries ([int], optional): Retries of failed connections and
+                of `RETRY_STATUSES` responses. Defaults to `HTTP_MAX_RETRIES`.
+        """
+        self.AUTH_TOKEN = AUTH_TOKEN
+        self.EVALAI_API_SERVER = EVALAI_API_SERVER
+        self.QUEUE_NAME = QUEUE_NAME
+        self.CHALLENGE_PK = CHALLENGE_PK
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def get_request_headers(self):
+        """Function to get the header of the EvalAI request in proper format
+
+        Returns:
+            [dict]: Authorization header
+        """
+        headers = {"Authorization": "Bearer {}".format(self.AUTH_TOKEN)}
+        return headers
+
+    async def make_request(self, url, method, data=None):
+        """Function to make request to EvalAI interface
+
+        Args:
+            url ([str]): URL of the request
+            method ([str]): Method of the request
+            data ([dict], optional): Data of the request. Defaults to None.
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size)
+            )
+        headers = self.get_request_headers()
+        labels = {"key": url_key(url), "method": method}
+        with REGISTRY.timer("evalai_api_request_seconds", **labels):
+            try:
+                return await self.send_request(url, method, headers, data)
+            except aiohttp.ClientError:
+                REGISTRY.increment("evalai_api_errors_total", **labels)
+                logger.info("The server isn't able establish connection with EvalAI")
+                raise
+
+    async def send_request(self, url, method, headers, data):
+        """Send a request, retrying failed connections and `RETRY_STATUSES`"""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(HTTP_BACKOFF_FACTOR * 2 ** (attempt - 1))
+            try:
+                async with self.session.request(
+                    method, url, headers=headers, data=data
+                ) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        continue
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except aiohttp.ClientConnectionError:
+                if attempt == self.max_retries:
+                    raise
+
+    def return_url_per_environment(self, url):
+        """Function to get the URL for API
+
+        Args:
+            url ([str]): API endpoint url to which the request is to be made
+
+        Returns:
+            [str]: API endpoint url with EvalAI base url attached
+        """
+        base_url = "{0}".format(self.EVALAI_API_SERVER)
+        url = "{0}{1}".format(base_url, url)
+        return url
+
+    async def get_message_from_sqs_queue(self):
+        """Function to get the message from SQS Queue
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("get_message_from_sqs_queue").format(self.QUEUE_NAME)
+        url = self.return_url_per_environment(url)
+        return await self.make_request(url, "GET")
+
+    async def delete_message_from_sqs_queue(self, receipt_handle):
+        """Function to delete the submission message from the queue
+
+        Args:
+            receipt_handle ([str]): Receipt handle of the message to be deleted
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("delete_message_from_sqs_queue").format(self.QUEUE_NAME)
+        url = self.return_url_per_environment(url)
+        data = {"receipt_handle": receipt_handle}
+        return await self.make_request(url, "POST", data)
+
+    async def update_submission_data(self, data):
+        """Function to update the submission data on EvalAI
+
+        Args:
+            data ([dict]): Data to be updated
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("update_submission").format(self.CHALLENGE_PK)
+        url = self.return_url_per_environment(url)
+        return await self.make_request(url, "PUT", data=data)
+
+    async def update_submission_status(self, data):
+        """Function to update the submission status on EvalAI
+
+        Args:
+            data ([dict]): Data to be updated
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("update_submission").format(self.CHALLENGE_PK)
+        url = self.return_url_per_environment(url)
+        return await self.make_request(url, "PATCH", data=data)
+
+    async def get_submission_by_pk(self, submission_pk):
+        url = URLS.get("get_submission_by_pk").format(submission_pk)
+        url = self.return_url_per_environment(url)
+        return await self.make_request(url, "GET")
@@ -0,0 +1,381 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import traceback
+
+from journal import (
+    FETCHED,
+    REPORTED,
+    SCORED,
+    Journal,
+    is_new_attempt,
+    unreported_result,
+)
+from metrics import METRICS_PORT, REGISTRY, start_metrics_server
+from poller import AdaptivePoller
+from prefetch import DONE_STATUSES, PREFETCH_MAX_AGE, PREFETCH_SIZE
+from worker import MEMORY_LIMIT_MB, NUM_SLOTS, limit_memory, run_evaluation
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSubmissionWorker:
+    def __init__(
+        self,
+        evalai,
+        evaluate,
+        num_slots=NUM_SLOTS,
+        memory_limit_mb=MEMORY_LIMIT_MB,
+        poller=None,
+        prefetch_size=PREFETCH_SIZE,
+        journal=None,
+        metrics_port=METRICS_PORT,
+    ):
+        """Evaluate queued submissions from an asyncio event loop
+
+        Works like `SubmissionWorker`, but every submission is a task of the
+        event loop: its status update, result upload and message deletion
+        overlap with polling and with the evaluations of other submissions,
+        which run in a process pool. A prefetch task keeps a small buffer of
+        messages with resolved submissions ahead of the free slots. A message
+        that comes back while its submission is still evaluated here is
+        dropped and its newest receipt handle is kept.
+
+        Args:
+            evalai ([AsyncEvalAI_Interface]): Async client of the EvalAI API
+            evaluate ([callable]): Picklable function that takes the
+                submission record and returns the list of split results for
+                the "result" field of the submission, raising on failure
+            num_slots ([int], optional): Number of concurrent evaluations.
+                Defaults to `NUM_SLOTS`.
+            memory_limit_mb ([int], optional): Memory limit of every
+                evaluation in MiB, 0 for none. Defaults to `MEMORY_LIMIT_MB`.
+            poller ([AdaptivePoller], optional): Sleep schedule between polls
+                of the queue. Defaults to a new `AdaptivePoller`.
+            prefetch_size ([int], optional): Submissions fetched ahead of a
+                free slot. Defaults to `PREFETCH_SIZE`.
+            journal ([Journal], optional): Journal of the submission stages.
+                Defaults to a `Journal` at `JOURNAL_PATH`.
+            metrics_port ([int], optional): Port of the metrics endpoint, 0
+                for none. Defaults to `METRICS_PORT`.
+        """
+        self.evalai = evalai
+        self.evaluate = evaluate
+        self.num_slots = num_slots
+        self.memory_limit_mb = memory_limit_mb
+        self.poller = poller or AdaptivePoller()
+        self.prefetch_size = max(1, prefetch_size)
+        self.journal = journal or Journal()
+        self.metrics_port = metrics_port
+        self.executor = None
+        # Pool of one process for the evaluations of a broken pool
+        self.isolation = None
+        self.isolation_lock = None
+        self.slots = None
+        # (message, submission, fetch time) of the submissions ready to be
+        # evaluated
+        self.prefetched = None
+        # Submission -> latest queue message of its evaluation
+        self.messages = {}
+        self.tasks = set()
+
+    def new_pool(self, max_workers):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=limit_memory,
+            initargs=(self.memory_limit_mb,),
+        )
+
+    def start_executor(self):
+        self.executor = self.new_pool(self.num_slots)
+
+    async def run(self):
+        """Serve the queue forever"""
+        self.slots = asyncio.Semaphore(self.num_slots)
+        self.prefetched = asyncio.Queue(maxsize=self.prefetch_size)
+        REGISTRY.set_function("evaluation_in_flight", lambda: len(self.messages))
+        metrics_server = start_metrics_server(self.metrics_port)
+        self.start_executor()
+        self.isolation = self.new_pool(1)
+        self.isolation_lock = asyncio.Lock()
+        prefetch = asyncio.ensure_future(self.prefetch())
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                await self.slots.acquire()
+                message, submission, fetched = await self.prefetched.get()
+                if loop.time() - fetched >= PREFETCH_MAX_AGE:
+                    submission = await self.resolve_again(message, submission)
+                    if submission is None:
+                        self.slots.release()
+                        continue
+                submission_pk = message["body"].get("submission_pk")
+                if submission_pk in self.messages:
+                    # The message came back while the submission is evaluated
+                    # here. Only the newest receipt handle is sure to delete it.
+                    logger.info(
+                        "Submission {} delivered again while running, "
+                        "dropped".format(submission_pk)
+                    )
+                    self.messages[submission_pk] = message
+                    self.slots.release()
+                    continue
+                self.messages[submission_pk] = message
+                self.start_task(self.process(message, submission))
+        finally:
+            prefetch.cancel()
+            if self.tasks:
+                await asyncio.wait(self.tasks)
+            self.executor.shutdown(wait=True)
+            self.isolation.shutdown(wait=True)
+            if metrics_server is not None:
+                metrics_server.shutdown()
+
+    def start_task(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def prefetch(self):
+        """Fill the prefetch buffer, polling while it has room"""
+        while True:
+            try:
+                got_message = await self.fetch()
+            except Exception:
+                REGISTRY.increment("evaluation_queue_polls_total", result="error")
+                logger.exception("Polling the submission queue failed")
+                got_message = False
+            await asyncio.sleep(self.poller.next_delay(got_message))
+
+    async def fetch(self):
+        """Fetch one message and buffer it with its submission
+
+        Returns:
+            [bool]: Whether the queue returned a message
+        """
+        message = await self.evalai.get_message_from_sqs_queue()
+        message_body = message.get("body")
+        if not message_body:
+            REGISTRY.increment("evaluation_queue_polls_total", result="empty")
+            return False
+        REGISTRY.increment("evaluation_queue_polls_total", result="message")
+        submission = await self.evalai.get_submission_by_pk(
+            message_body.get("submission_pk")
+        )
+        if await self.ready(message, submission):
+            # Waits while the buffer is full
+            await self.prefetched.put(
+                (message, submission, asyncio.get_event_loop().time())
+            )
+        return True
+
+    async def ready(self, message, submission):
+        """Whether a submission is ready to be evaluated
+
+        Messages of finished, failed or cancelled submissions are deleted.
+        A running submission is only ready if it was started here before a
+        restart, and `process` then reports it from the journal or evaluates
+        it again.
+
+        Args:
+            message ([dict]): Queue message
+            submission ([dict]): Submission record of the message
+
+        Returns:
+            [bool]: Whether to evaluate the submission
+        """
+        status = submission.get("status")
+        if status in DONE_STATUSES:
+            self.start_task(self.delete_message(message.get("receipt_handle")))
+            return False
+        if status != "running":
+            return True
+        submission_pk = message["body"].get("submission_pk")
+        if submission_pk in self.messages:
+            # Delivered again while it is evaluated here, keep the newest
+            # receipt handle
+            logger.info(
+                "Submission {} delivered again while running, dropped".format(
+                    submission_pk
+                )
+            )
+            self.messages[submission_pk] = message
+            return False
+        stages = await self.run_blocking(self.journal.stages, submission_pk)
+        return FETCHED in stages and REPORTED not in stages
+
+    async def resolve_again(self, message, submission):
+        """Resolve a submission that waited in the buffer for too long
+
+        Its message may have become visible again meanwhile and another
+        worker may have started it.
+
+        Args:
+            message ([dict]): Queue message
+            submission ([dict]): Submission record of the message
+
+        Returns:
+            [dict]: Current submission record, or None if the submission is
+                no longer ready to be evaluated
+        """
+        try:
+            submission = await self.evalai.get_submission_by_pk(
+                message["body"].get("submission_pk")
+            )
+        except Exception:
+            logger.exception("Resolving a buffered submission again failed")
+            return submission
+        return submission if await self.ready(message, submission) else None
+
+    async def run_blocking(self, function, *args):
+        """Run a blocking call, e.g. of the journal, in the default executor
+
+        Every record of the journal waits for an fsync, which must not stall
+        the event loop.
+        """
+        return await asyncio.get_event_loop().run_in_executor(None, function, *args)
+
+    async def delete_message(self, receipt_handle):
+        try:
+            await self.evalai.delete_message_from_sqs_queue(receipt_handle)
+        except Exception:
+            logger.exception("Deleting message {} failed".format(receipt_handle))
+
+    async def process(self, message, submission):
+        """Evaluate one submission and report it
+
+        The slot is freed as soon as the evaluation ends, before the report.
+        """
+        submission_pk = message["body"].get("submission_pk")
+        try:
+            stages = await self.run_blocking(self.journal.stages, submission_pk)
+            scored = unreported_result(stages)
+            if scored is not None:
+                # Scored before a restart, only the report is missing
+                logger.info("Submission {} was already scored".format(submission_pk))
+                self.slots.release()
+                try:
+                    await self.report(
+                        self.messages.pop(submission_pk, message), **scored
+                    )
+                except Exception:
+                    logger.exception(
+                        "Reporting submission {} failed".format(submission_pk)
+                    )
+                return
+            if is_new_attempt(stages):
+                # An interrupted attempt keeps its stages, e.g. the download
+                await self.run_blocking(
+                    self.journal.record, submission_pk, FETCHED, submission
+                )
+            logger.info("Starting evaluation of submission {}".format(submission_pk))
+            try:
+                # The status update goes out while the evaluation runs
+                status = asyncio.ensure_future(
+                    self.evalai.update_submission_status(
+                        {
+                            "submission": submission_pk,
+                            "job_name": "",
+                            "submission_status": "RUNNING",
+                        }
+                    )
+                )
+                try:
+                    result, error, metrics = await self.run_evaluation(
+                        submission_pk, submission
+                    )
+                    REGISTRY.merge(metrics)
+                except concurrent.futures.process.BrokenProcessPool:
+                    result, error = None, "The evaluation ran out of memory or crashed"
+                except Exception:
+                    result, error = None, traceback.format_exc()
+                REGISTRY.increment(
+                    "evaluations_total", status="failed" if error else "finished"
+                )
+                await self.run_blocking(
+                    self.journal.record,
+                    submission_pk,
+                    SCORED,
+                    {"result": result, "error": error},
+                )
+            finally:
+                self.slots.release()
+            try:
+                # The final update must not overtake the RUNNING status, which
+                # may have failed on its own
+                await asyncio.wait([status])
+                message = self.messages.pop(submission_pk, message)
+                await self.report(message, result=result, error=error)
+            except Exception:
+                logger.exception("Reporting submission {} failed".format(submission_pk))
+        finally:
+            # A failing journal must not leave the message in flight, where
+            # its redelivery would be dropped
+            self.messages.pop(submission_pk, None)
+
+    async def run_evaluation(self, submission_pk, submission):
+        """Run `run_evaluation` in the pool
+
+        A killed process breaks the whole pool and fails all of its
+        evaluations, not only the one that crashed. The pool is replaced and
+        those evaluations run again one at a time in the isolation pool,
+        where a crash can only come from the evaluation itself.
+
+        Returns:
+            [tuple]: Result of `run_evaluation`
+        """
+        loop = asyncio.get_event_loop()
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(
+                executor, run_evaluation, self.evaluate, submission
+            )
+        except concurrent.futures.process.BrokenProcessPool:
+            if executor is self.executor:
+                executor.shutdown(wait=False)
+                self.start_executor()
+        async with self.isolation_lock:
+            logger.info(
+                "Evaluating submission {} again on its own after a broken "
+                "pool".format(submission_pk)
+            )
+            executor = self.isolation
+            try:
+                return await loop.run_in_executor(
+                    executor, run_evaluation, self.evaluate, submission
+                )
+            except concurrent.futures.process.BrokenProcessPool:
+                executor.shutdown(wait=False)
+                self.isolation = self.new_pool(1)
+                raise
+
+    async def report(self, message, result=None, error=None):
+        """Send the outcome of an evaluation to EvalAI and delete its message
+
+        Args:
+            message ([dict]): Queue message of the submission
+            result ([list], optional): Split results of a finished evaluation
+            error ([str], optional): Error of a failed evaluation
+        """
+        message_body = message["body"]
+        submission_data = {
+            "challenge_phase": message_body.get("phase_pk"),
+            "submission": message_body.get("submission_pk"),
+            "stdout": "",
+            "stderr": error or "",
+            "submission_status": "FAILED" if error else "FINISHED",
+            "metadata": "",
+        }
+        if not error:
+            submission_data["result"] = json.dumps(result)
+        logger.info(
+            "Submission {} {}".format(
+                message_body.get("submission_pk"), submission_data["submission_status"]
+            )
+        )
+        await self.evalai.update_submission_data(submission_data)
+        await self.run_blocking(
+            self.journal.record, message_body.get("submission_pk"), REPORTED
+        )
+        await self.evalai.delete_message_from_sqs_queue(message.get("receipt_handle"))
@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Bytes written per step, which bounds the memory of a download
+CHUNK_SIZE = 1 << 20
+# Attempts to fetch the rest of the file after a dropped connection
+DOWNLOAD_ATTEMPTS = 5
+DOWNLOAD_BACKOFF = 1.0
+# Seconds to wait for the server to connect and to send the next bytes
+DOWNLOAD_TIMEOUT = 60
+
+CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+)")
+# Content-Range of a 416 response, with the size of the file
+UNSATISFIED_RANGE = re.compile(r"bytes \*/(\d+)")
+
+
+class Download:
+    def __init__(
+        self,
+        session,
+        url,
+        path,
+        size=None,
+        sha256=None,
+        chunk_size=CHUNK_SIZE,
+        max_attempts=DOWNLOAD_ATTEMPTS,
+    ):
+        """Streaming download of a file that resumes with HTTP range requests
+
+        The file is written in chunks to `path + ".part"`, which is renamed to
+        `path` once its size and checksum are verified. A partial file left
+        by an earlier run is resumed as well.
+
+        Args:
+            session ([requests.Session]): Session of the requests
+            url ([str]): URL of the file, e.g. `input_file` of a submission
+            path ([str]): Destination of the file
+            size ([int], optional): Expected size in bytes. Defaults to the
+                size announced by the server.
+            sha256 ([str], optional): Expected hex SHA-256 of the file.
+                Defaults to no check.
+            chunk_size ([int], optional): Bytes written per step. Defaults to
+                `CHUNK_SIZE`.
+            max_attempts ([int], optional): Requests before giving up.
+                Defaults to `DOWNLOAD_ATTEMPTS`.
+        """
+        self.session = session
+        self.url = url
+        self.path = path
+        self.part_path = path + ".part"
+        self.size = size
+        self.sha256 = sha256
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.condition = threading.Condition()
+        self.received = 0
+        self.total = size
+        self.done = False
+        self.error = None
+        self.digest = None
+        self.thread = None
+
+    def start(self):
+        """Run the download in a background thread
+
+        Returns:
+            [Download]: This download
+        """
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def wait(self):
+        """Wait for the end of the download
+
+        Returns:
+            [str]: Path of the verified file
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.path
+
+    def run(self):
+        try:
+            with REGISTRY.timer("evaluation_stage_seconds", stage="download"):
+                self.fetch()
+        except Exception as error:
+            logger.info("Download of {} failed: {}".format(self.url, error))
+            with self.condition:
+                self.error = error
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+
+    def fetch(self):
+        hasher = hashlib.sha256()
+        with open(self.part_path, "ab+") as f:
+            # Resume a partial file of an earlier run
+            f.seek(0)
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                hasher.update(chunk)
+            self.advance(f.tell())
+            attempt = 0
+            while self.total is None or self.received < self.total:
+                attempt += 1
+                try:
+                    self.fetch_rest(f, hasher)
+                except (
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout,
+                ):
+                    if attempt >= self.max_attempts:
+                        raise
+                    logger.info(
+                        "Download of {} interrupted after {} bytes, resuming".format(
+                            self.url, self.received
+                        )
+                    )
+                    time.sleep(DOWNLOAD_BACKOFF * 2 ** (attempt - 1))
+                else:
+                    if self.total is None:
+                        # Without a known size, the end of the body is the end
+                        self.total = self.received
+                    elif self.received < self.total and attempt >= self.max_attempts:
+                        break
+        if self.total is not None and self.received != self.total:
+            raise ValueError(
+                "Downloaded {} bytes of {}, expected {}".format(
+                    self.received, self.url, self.total
+                )
+            )
+        self.digest = hasher.hexdigest()
+        if self.sha256 and self.digest != self.sha256.lower():
+            os.remove(self.part_path)
+            raise ValueError(
+                "SHA-256 of {} is {}, expected {}".format(
+                    self.url, self.digest, self.sha256
+                )
+            )
+        os.replace(self.part_path, self.path)
+
+    def fetch_rest(self, f, hasher):
+        """Request the bytes after the ones already written and append them"""
+        headers = {"Range": "bytes={}-".format(self.received)} if self.received else {}
+        with self.session.get(
+            self.url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT
+        ) as response:
+            if response.status_code == 416 and self.total is None:
+                # The partial file of an earlier run may already be complete
+                match = UNSATISFIED_RANGE.match(
+                    response.headers.get("Content-Range", "")
+                )
+                if match is None or int(match.group(1)) != self.received:
+                    f.truncate(0)
+                    raise ValueError(
+                        "{} refused the range after the {} bytes of the "
+                        "partial file".format(self.url, self.received)
+                    )
+                self.total = self.received
+                return
+            response.raise_for_status()
+            skip = 0
+            match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if response.status_code == 206 and match:
+                if int(match.group(1)) != self.received:
+                    raise ValueError("The server sent an unexpected range")
+                total = int(match.group(2))
+            else:
+                # The server ignored the range, skip the bytes already written
+                skip = self.received
+                total = response.headers.get("Content-Length")
+                total = int(total) if total is not None else None
+            if total is not None:
+                if self.total is not None and total != self.total:
+                    raise ValueError(
+                        "{} has {} bytes, expected {}".format(
+                            self.url, total, self.total
+                        )
+                    )
+                self.total = total
+            for chunk in response.iter_content(self.chunk_size):
+                if skip:
+                    chunk, skip = chunk[skip:], max(0, skip - len(chunk))
+                if chunk:
+                    f.write(chunk)
+                    f.flush()
+                    hasher.update(chunk)
+                    self.advance(len(chunk))
+
+    def advance(self, num_bytes):
+        with self.condition:
+            self.received += num_bytes
+            self.condition.notify_all()
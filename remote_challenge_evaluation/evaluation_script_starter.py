@@ -1,10 +1,43 @@
+import collections
 import logging
+import os
+import re
 import requests
 import json
+import sys
 import time
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from download import Download
+from journal import DOWNLOADED, Journal
+from metrics import REGISTRY
+from worker import SubmissionWorker
+
 logger = logging.getLogger(__name__)
 
+# Kept-alive connections to the EvalAI API
+HTTP_POOL_SIZE = int(os.environ.get("EVALAI_HTTP_POOL_SIZE", 4))
+# Transport-level retries of a failed request, with exponential backoff
+HTTP_MAX_RETRIES = int(os.environ.get("EVALAI_HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Every call of the interface can be repeated safely: deleting a message and
+# updating a submission twice has the same effect as once
+RETRY_METHODS = ("GET", "POST", "PUT", "PATCH")
+
+# Codename and annotation file of every challenge phase by phase pk, e.g.
+# {"4": {"codename": "dev", "annotations": "annotations/test_annotations_devsplit.txt"}}
+EVALUATION_PHASES = json.loads(os.environ.get("EVALUATION_PHASES", "{}"))
+# Directory of the `evaluation_script` package of the challenge
+EVALUATION_SCRIPT_DIR = os.environ.get(
+    "EVALUATION_SCRIPT_DIR",
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+)
+# Directory of the downloaded submission files
+DOWNLOAD_DIR = os.environ.get("EVALUATION_DOWNLOAD_DIR", "submissions")
+
 
 URLS = {
     "get_message_from_sqs_queue": "/api/jobs/challenge/queues/{}/",
@@ -13,9 +46,64 @@ URLS = {
     "update_submission": "/api/jobs/challenge/{}/update_submission/",
 }
 
+# Patterns that map a request URL back to its key in URLS
+URL_PATTERNS = [
+    (re.compile(re.escape(path).replace(r"\{\}", "[^/]+") + "$"), key)
+    for key, path in URLS.items()
+]
+
+
+def url_key(url):
+    """Function to find the key in URLS of a request URL
+
+    Args:
+        url ([str]): URL of the request
+
+    Returns:
+        [str]: Key of the URL in URLS, or "other"
+    """
+    for pattern, key in URL_PATTERNS:
+        if pattern.search(url):
+            return key
+    return "other"
+
+
+def make_session(pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES):
+    """Function to create a pooled keep-alive HTTP session
+
+    Args:
+        pool_size ([int], optional): Connections kept per host. Defaults to
+            `HTTP_POOL_SIZE`.
+        max_retries ([int], optional): Retries of failed connections and of
+            `RETRY_STATUSES` responses. Defaults to `HTTP_MAX_RETRIES`.
+
+    Returns:
+        [requests.Session]: Session that reuses its connections
+    """
+    retry_options = dict(
+        total=max_retries,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(allowed_methods=RETRY_METHODS, **retry_options)
+    except TypeError:
+        # urllib3 before 1.26
+        retry = Retry(method_whitelist=RETRY_METHODS, **retry_options)
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 class EvalAI_Interface:
-    def __init__(self, AUTH_TOKEN, EVALAI_API_SERVER, QUEUE_NAME, CHALLENGE_PK):
+    def __init__(
+        self, AUTH_TOKEN, EVALAI_API_SERVER, QUEUE_NAME, CHALLENGE_PK, session=None
+    ):
         """Class to initiate call to EvalAI backend
 
         Arguments:
@@ -23,12 +111,14 @@ class EvalAI_Interface:
             EVALAI_API_SERVER {[string]} -- It should be set to https://eval.ai # For production server
             QUEUE_NAME {[string]} -- Unique queue name corresponding to every challenge
             CHALLENGE_PK {[integer]} -- Primary key corresponding to a challenge
+            session {[requests.Session]} -- HTTP session shared by all calls, defaults to a new pooled session
         """
 
         self.AUTH_TOKEN = AUTH_TOKEN
         self.EVALAI_API_SERVER = EVALAI_API_SERVER
         self.QUEUE_NAME = QUEUE_NAME
         self.CHALLENGE_PK = CHALLENGE_PK
+        self.session = session or make_session()
 
     def get_request_headers(self):
         """Function to get the header of the EvalAI request in proper format
@@ -51,12 +141,15 @@ class EvalAI_Interface:
             [JSON]: JSON response data
         """
         headers = self.get_request_headers()
+        labels = {"key": url_key(url), "method": method}
         try:
-            response = requests.request(
-                method=method, url=url, headers=headers, data=data
-            )
+            with REGISTRY.timer("evalai_api_request_seconds", **labels):
+                response = self.session.request(
+                    method=method, url=url, headers=headers, data=data
+                )
             response.raise_for_status()
         except requests.exceptions.RequestException:
+            REGISTRY.increment("evalai_api_errors_total", **labels)
             logger.info("The server isn't able establish connection with EvalAI")
             raise
         return response.json()
@@ -136,6 +229,20 @@ class EvalAI_Interface:
         response = self.make_request(url, "PATCH", data=data)
         return response
 
+    def download_file(self, url, path, size=None, sha256=None):
+        """Function to start a streaming download of a file, e.g. the `input_file` of a submission
+
+        Args:
+            url ([str]): URL of the file
+            path ([str]): Destination of the file
+            size ([int], optional): Expected size in bytes. Defaults to None.
+            sha256 ([str], optional): Expected hex SHA-256. Defaults to None.
+
+        Returns:
+            [Download]: Running download, `wait()` returns the verified path
+        """
+        return Download(self.session, url, path, size=size, sha256=sha256).start()
+
     def get_submission_by_pk(self, submission_pk):
         url = URLS.get("get_submission_by_pk").format(submission_pk)
         url = self.return_url_per_environment(url)
@@ -143,47 +250,99 @@ class EvalAI_Interface:
         return response
 
 
+def evaluate_submission(submission):
+    """Evaluate one submission, called in a separate worker process
+
+    The input file of the submission is downloaded to `DOWNLOAD_DIR` and
+    scored by `evaluation_script.evaluate` against the annotations of its
+    phase in `EVALUATION_PHASES`. A download that is already recorded in the
+    journal is not fetched again when a crashed evaluation is retried.
+    The validate stage and the lookups of the result cache are counted by
+    the evaluation script itself and recorded in `REGISTRY` here. Replace
+    this function to evaluate the submissions with your own code.
+
+    Args:
+        submission ([dict]): Submission record from `get_submission_by_pk`
+
+    Returns:
+        [list]: Result of every dataset split, e.g.
+            [{"split": "<split-name>", "show_to_participant": True,
+              "accuracies": {"Metric1": 80, "Metric2": 60, "Metric3": 60, "Total": 10}}]
+    """
+    phase = EVALUATION_PHASES.get(str(submission["challenge_phase"]))
+    if phase is None:
+        raise ValueError(
+            "Phase {} is missing from EVALUATION_PHASES".format(
+                submission["challenge_phase"]
+            )
+        )
+    if EVALUATION_SCRIPT_DIR not in sys.path:
+        sys.path.append(EVALUATION_SCRIPT_DIR)
+    from evaluation_script import evaluate
+    from evaluation_script.cache import REQUESTS
+    from evaluation_script.validation import VALIDATIONS
+
+    journal = Journal()
+    try:
+        path = journal.stages(submission["id"]).get(DOWNLOADED)
+        if path is None or not os.path.exists(path):
+            os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+            path = os.path.join(DOWNLOAD_DIR, "submission_{}".format(submission["id"]))
+            Download(make_session(), submission["input_file"], path).start().wait()
+            journal.record(submission["id"], DOWNLOADED, path)
+    finally:
+        journal.close()
+    cache_requests = collections.Counter(REQUESTS)
+    validations = collections.Counter(VALIDATIONS)
+    try:
+        output = evaluate(
+            phase["annotations"],
+            path,
+            phase["codename"],
+            submission_metadata=submission,
+        )
+    finally:
+        os.remove(path)
+        for result, amount in (REQUESTS - cache_requests).items():
+            REGISTRY.increment("evaluation_cache_requests_total", amount, result=result)
+        validated = VALIDATIONS - validations
+        if validated["count"]:
+            REGISTRY.observe(
+                "evaluation_stage_seconds", validated["seconds"], stage="validate"
+            )
+    return [
+        {"split": split, "show_to_participant": True, "accuracies": accuracies}
+        for split_result in output["result"]
+        for split, accuracies in split_result.items()
+    ]
+
+
 if __name__ == "__main__":
 
     auth_token = ""  # Go to EvalAI UI to fetch your auth token
     evalai_api_server = ""  # For staging server, use -- https://staging.eval.ai; For production server, use -- https://eval.ai
-    queue_name = ""  # Please email EvalAI admin (team@cloudcv.org) to get the queue name
+    queue_name = (
+        ""  # Please email EvalAI admin (team@cloudcv.org) to get the queue name
+    )
     challenge_pk = ""  # Please email EvalAI admin (team@cloudcv.org) to get the challenge primary key
 
+    if not EVALUATION_PHASES:
+        raise SystemExit(
+            "Set EVALUATION_PHASES to the codename and annotation file of every "
+            "challenge phase, or replace evaluate_submission with your own"
+        )
+
     # Create evalai object
     evalai = EvalAI_Interface(auth_token, evalai_api_server, queue_name, challenge_pk)
 
     # Q. How to set up the remote evaluation?
-    while True:
-        # Get the message from the queue
-        message = evalai.get_message_from_sqs_queue()
-        message_body = message.get("body")
-        if message_body:
-            submission_pk = message_body.get("submission_pk")
-            challenge_pk = message_body.get("challenge_pk")
-            phase_pk = message_body.get("phase_pk")
-            # Get submission details -- This will contain the input file URL
-            submission = evalai.get_submission_by_pk(submission_pk)
-
-            if (
-                submission.get("status") == "finished"
-                or submission.get("status") == "failed"
-                or submission.get("status") == "cancelled"
-            ):
-                message_receipt_handle = message.get("receipt_handle")
-                evalai.delete_message_from_sqs_queue(message_receipt_handle)
-
-            elif submission.get("status") == "running":
-                # Do nothing on EvalAI
-                pass
-
-            else:
-                # Download the input file
-                # Run the submission with the input file using your own code and data.
-                pass
-
-        # Poll challenge queue for new submissions
-        time.sleep(60)
+    # The worker pulls messages from the queue while one of its evaluation
+    # slots is free and runs `evaluate_submission` for every new submission.
+    # Set EVALUATION_SLOTS and EVALUATION_MEMORY_LIMIT_MB to size the slots.
+    # An empty queue is polled less and less often, up to once every
+    # EVALUATION_POLL_MAX_INTERVAL seconds, and right away again after a message.
+    worker = SubmissionWorker(evalai, evaluate_submission)
+    worker.run()
 
     # Q. How to update EvalAI with the submission state?
 
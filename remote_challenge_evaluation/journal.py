@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Local journal of the submissions handled by this worker
+JOURNAL_PATH = os.environ.get("EVALUATION_JOURNAL", "evaluation_journal.sqlite3")
+
+FETCHED = "fetched"
+DOWNLOADED = "downloaded"
+VALIDATED = "validated"
+SCORED = "scored"
+REPORTED = "reported"
+STAGES = (FETCHED, DOWNLOADED, VALIDATED, SCORED, REPORTED)
+
+
+def unreported_result(stages):
+    """Outcome of an attempt that was scored but not reported
+
+    Only a successful result is reported from the journal. A failure may be
+    transient, and a reported attempt is over, so both are evaluated again.
+
+    Args:
+        stages ([dict]): Stages of the latest attempt from `Journal.stages`
+
+    Returns:
+        [dict]: "result" and "error" of the scored stage, or None if the
+            submission must be evaluated
+    """
+    scored = stages.get(SCORED)
+    if scored is None or scored.get("error") or REPORTED in stages:
+        return None
+    return scored
+
+
+def is_new_attempt(stages):
+    """Whether an evaluation starts a new attempt instead of resuming one
+
+    Args:
+        stages ([dict]): Stages of the latest attempt from `Journal.stages`
+
+    Returns:
+        [bool]: True if the latest attempt is over or there is none
+    """
+    return FETCHED not in stages or SCORED in stages
+
+
+class Journal:
+    def __init__(self, path=JOURNAL_PATH):
+        """Crash-safe append-only journal of the stages of every submission
+
+        Every finished stage is appended to an SQLite database with the
+        artifact of the stage, e.g. the path of the downloaded file or the
+        result of the scoring, and is on disk before `record` returns. A
+        worker that restarts after a crash reads the stages back and skips
+        the work that is already done. The evaluation processes can open
+        the same journal to record their own stages.
+
+        Args:
+            path ([str], optional): Path of the database. Defaults to
+                `JOURNAL_PATH`.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        # The write-ahead log lets the worker and the evaluation processes
+        # write at the same time, and survives a crash of the process
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS stages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "submission_pk TEXT NOT NULL, "
+            "stage TEXT NOT NULL, "
+            "artifact TEXT, "
+            "time REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS stages_submission ON stages (submission_pk)"
+        )
+
+    def record(self, submission_pk, stage, artifact=None):
+        """Append a finished stage of a submission
+
+        Args:
+            submission_pk ([int]): Primary key of the submission
+            stage ([str]): One of `STAGES`
+            artifact ([object], optional): JSON-serializable output of the
+                stage. Defaults to None.
+        """
+        if stage not in STAGES:
+            raise ValueError("Unknown stage {!r}".format(stage))
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO stages (submission_pk, stage, artifact, time) "
+                "VALUES (?, ?, ?, ?)",
+                (str(submission_pk), stage, json.dumps(artifact), time.time()),
+            )
+
+    def stages(self, submission_pk):
+        """Finished stages of the latest attempt of a submission
+
+        Every attempt starts with the fetched stage, so the stages of an
+        earlier evaluation of the same submission are not returned.
+
+        Args:
+            submission_pk ([int]): Primary key of the submission
+
+        Returns:
+            [dict]: Latest artifact of every finished stage
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT stage, artifact FROM stages WHERE submission_pk = ? "
+                "ORDER BY id",
+                (str(submission_pk),),
+            ).fetchall()
+        stages = {}
+        for stage, artifact in rows:
+            if stage == FETCHED:
+                stages.clear()
+            stages[stage] = json.loads(artifact)
+        return stages
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
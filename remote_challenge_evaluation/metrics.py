@@ -0,0 +1,255 @@
+import bisect
+import contextlib
+import http.server
+import logging
+import os
+import resource
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Port of the metrics endpoint, 0 turns it off
+METRICS_PORT = int(os.environ.get("EVALUATION_METRICS_PORT", 0))
+
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+BYTES_BUCKETS = tuple(1 << shift for shift in range(26, 37))
+
+# Name -> (type, help, histogram buckets) of the metrics of the worker
+METRICS = {
+    "evaluation_queue_polls_total": (
+        "counter",
+        "Polls of the submission queue by result (message, empty, error)",
+        None,
+    ),
+    "evalai_api_request_seconds": (
+        "histogram",
+        "Latency of EvalAI API calls by URLS key and method",
+        SECONDS_BUCKETS,
+    ),
+    "evalai_api_errors_total": (
+        "counter",
+        "Failed EvalAI API calls by URLS key and method",
+        None,
+    ),
+    "evaluation_stage_seconds": (
+        "histogram",
+        "Time per stage of a submission (download, validate, score, report)",
+        SECONDS_BUCKETS,
+    ),
+    "evaluations_total": ("counter", "Evaluations by final status", None),
+    "evaluation_in_flight": ("gauge", "Submissions being evaluated", None),
+    "evaluation_cache_requests_total": (
+        "counter",
+        "Lookups of evaluation caches by result (hit, miss)",
+        None,
+    ),
+    "evaluation_peak_rss_bytes": (
+        "histogram",
+        "Peak resident memory of every evaluation",
+        BYTES_BUCKETS,
+    ),
+}
+
+
+class Registry:
+    def __init__(self):
+        """Thread-safe store of counters, gauges and histograms
+
+        Metrics are identified by their name and labels and rendered in the
+        Prometheus text format. A pool process records into its own registry
+        and hands a `snapshot` back to the worker, which `merge`s it.
+        """
+        self.lock = threading.Lock()
+        # (name, labels) -> value of counters and gauges
+        self.values = {}
+        # (name, labels) -> [count per bucket..., sum, count] of histograms
+        self.histograms = {}
+        # Name -> callable that returns the current value of a gauge
+        self.functions = {}
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[(name, tuple(sorted(labels.items())))] = value
+
+    def set_function(self, name, function):
+        """Compute a gauge when it is rendered"""
+        with self.lock:
+            self.functions[name] = function
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 3)
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Observe the seconds spent in a `with` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def total(self, name, **labels):
+        """Sum of the observations of a histogram"""
+        with self.lock:
+            histogram = self.histograms.get((name, tuple(sorted(labels.items()))))
+            return histogram[-2] if histogram else 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "values": dict(self.values),
+                "histograms": {
+                    key: list(histogram) for key, histogram in self.histograms.items()
+                },
+            }
+
+    def merge(self, snapshot):
+        """Add the counters and histograms of a snapshot to this registry"""
+        with self.lock:
+            for key, value in snapshot["values"].items():
+                self.values[key] = self.values.get(key, 0) + value
+            for key, histogram in snapshot["histograms"].items():
+                mine = self.histograms.get(key)
+                if mine is None:
+                    self.histograms[key] = list(histogram)
+                else:
+                    self.histograms[key] = [a + b for a, b in zip(mine, histogram)]
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.histograms.clear()
+
+    def render(self):
+        """Render every metric in the Prometheus text format
+
+        Returns:
+            [str]: Exposition text
+        """
+        with self.lock:
+            values = dict(self.values)
+            histograms = {key: list(value) for key, value in self.histograms.items()}
+            functions = dict(self.functions)
+        for name, function in functions.items():
+            values[(name, ())] = function()
+        lines = []
+        for name, (kind, text, buckets) in METRICS.items():
+            lines.append("# HELP {} {}".format(name, text))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append("{}{} {}".format(name, format_labels(labels), value))
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), histogram):
+                    cumulative += count
+                    lines.append(
+                        "{}_bucket{} {}".format(
+                            name, format_labels(labels + (("le", bound),)), cumulative
+                        )
+                    )
+                lines.append(
+                    "{}_sum{} {}".format(name, format_labels(labels), histogram[-2])
+                )
+                lines.append(
+                    "{}_count{} {}".format(name, format_labels(labels), histogram[-1])
+                )
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join('{}="{}"'.format(key, value) for key, value in labels)
+    )
+
+
+# Registry of the current process
+REGISTRY = Registry()
+
+
+def reset_lock():
+    # A lock held by another thread of the worker when a pool process is
+    # forked would stay locked forever in the child
+    REGISTRY.lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_lock)
+
+
+def reset_peak_rss():
+    """Restart the peak RSS of this process where Linux allows it"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_bytes():
+    """Peak resident memory of this process since `reset_peak_rss`
+
+    Returns:
+        [int]: Bytes, from VmHWM on Linux and ru_maxrss elsewhere
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) << 10
+    except OSError:
+        pass
+    # Kilobytes on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == "Darwin" else maxrss << 10
+
+
+def start_metrics_server(port=METRICS_PORT, registry=REGISTRY):
+    """Serve the metrics at http://<host>:<port>/metrics from a thread
+
+    Args:
+        port ([int], optional): Port to listen on, 0 for no server. Defaults
+            to `METRICS_PORT`.
+        registry ([Registry], optional): Metrics to serve. Defaults to
+            `REGISTRY`.
+
+    Returns:
+        [http.server.ThreadingHTTPServer]: Running server, or None
+    """
+    if not port:
+        return None
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Serving metrics on port {}".format(port))
+    return server
@@ -0,0 +1,102 @@
+import logging
+import os
+import random
+
+logger = logging.getLogger(__name__)
+
+# Sleep of the fixed polling loop, the baseline of the saved latency
+FIXED_POLL_INTERVAL = 60.0
+# Shortest and longest sleep between polls of an empty queue in seconds. The
+# ceiling defaults to the fixed sleep, so a submission after a quiet period
+# never waits longer than it used to. Hosts may raise it to poll less.
+POLL_MIN_INTERVAL = float(os.environ.get("EVALUATION_POLL_MIN_INTERVAL", 1))
+POLL_MAX_INTERVAL = float(
+    os.environ.get("EVALUATION_POLL_MAX_INTERVAL", FIXED_POLL_INTERVAL)
+)
+POLL_BACKOFF = 2.0
+
+
+class AdaptivePoller:
+    def __init__(
+        self,
+        min_interval=POLL_MIN_INTERVAL,
+        max_interval=POLL_MAX_INTERVAL,
+        backoff=POLL_BACKOFF,
+        fixed_interval=FIXED_POLL_INTERVAL,
+        rng=None,
+    ):
+        """Sleep schedule between polls of the submission queue
+
+        The queue is polled again right away after a message. While it stays
+        empty the sleep grows exponentially up to `max_interval`, with equal
+        jitter so that several workers do not poll in lockstep. The first
+        message resets the schedule.
+
+        Args:
+            min_interval ([float], optional): First sleep after an empty poll.
+                Defaults to `POLL_MIN_INTERVAL`.
+            max_interval ([float], optional): Ceiling of the sleep. Defaults
+                to `POLL_MAX_INTERVAL`.
+            backoff ([float], optional): Growth factor of the sleep. Defaults
+                to `POLL_BACKOFF`.
+            fixed_interval ([float], optional): Sleep of a fixed polling loop
+                to compare with. Defaults to `FIXED_POLL_INTERVAL`.
+            rng ([random.Random], optional): Source of the jitter. Defaults to
+                a new generator.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.fixed_interval = fixed_interval
+        self.rng = rng or random.Random()
+        self.empty_polls = 0
+        # Growth steps of the sleep, which stop at the ceiling
+        self.backoff_steps = 0
+        # Sleep before the latest poll
+        self.delay = 0.0
+        self.num_messages = 0
+        self.saved_latency = 0.0
+
+    def next_delay(self, got_message):
+        """Record the outcome of a poll and pick the sleep before the next one
+
+        Args:
+            got_message ([bool]): Whether the poll returned a message
+
+        Returns:
+            [float]: Seconds to sleep before the next poll
+        """
+        if got_message:
+            # The fixed loop slept `fixed_interval` before every poll
+            self.num_messages += 1
+            self.saved_latency += self.fixed_interval - self.delay
+            if self.empty_polls:
+                logger.info(
+                    "Message after {} empty polls, {:.1f}s saved over {} messages".format(
+                        self.empty_polls, self.saved_latency, self.num_messages
+                    )
+                )
+            self.empty_polls = 0
+            self.backoff_steps = 0
+            self.delay = 0.0
+            return self.delay
+        ceiling = min(
+            self.max_interval, self.min_interval * self.backoff**self.backoff_steps
+        )
+        if ceiling < self.max_interval:
+            self.backoff_steps += 1
+        self.empty_polls += 1
+        self.delay = self.rng.uniform(ceiling / 2, ceiling)
+        return self.delay
+
+    def stats(self):
+        """Summary of the polling so far
+
+        Returns:
+            [dict]: Number of messages, total and mean saved latency in seconds
+        """
+        return {
+            "messages": self.num_messages,
+            "saved_latency": self.saved_latency,
+            "mean_saved_latency": self.saved_latency / max(self.num_messages, 1),
+        }
@@ -0,0 +1,163 @@
+import collections
+import logging
+import os
+import threading
+import time
+
+from metrics import REGISTRY
+from poller import AdaptivePoller
+
+logger = logging.getLogger(__name__)
+
+# Submissions fetched ahead of a free evaluation slot. Their messages are
+# invisible to other workers meanwhile, so the buffer stays small.
+PREFETCH_SIZE = int(os.environ.get("EVALUATION_PREFETCH", 2))
+# Seconds after which a buffered submission is resolved again before it
+# starts. Its message may have become visible again meanwhile and another
+# worker may have started it, so this stays well below the visibility timeout.
+PREFETCH_MAX_AGE = float(os.environ.get("EVALUATION_PREFETCH_MAX_AGE", 30))
+
+DONE_STATUSES = ("finished", "failed", "cancelled")
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        evalai,
+        size=PREFETCH_SIZE,
+        poller=None,
+        on_ready=None,
+        on_running=None,
+        max_age=PREFETCH_MAX_AGE,
+    ):
+        """Background look-ahead buffer of queue messages and submissions
+
+        A thread polls the queue while the buffer has room and resolves the
+        submission record of every message, so a free evaluation slot starts
+        right away instead of waiting on two API round trips. Messages of
+        finished, failed or cancelled submissions are deleted by the thread
+        and messages of running submissions go to `on_running` instead of
+        the buffer.
+
+        Args:
+            evalai ([EvalAI_Interface]): Client of the EvalAI API
+            size ([int], optional): Capacity of the buffer. Defaults to
+                `PREFETCH_SIZE`.
+            poller ([AdaptivePoller], optional): Sleep schedule between polls
+                of the queue. Defaults to a new `AdaptivePoller`.
+            on_ready ([callable], optional): Called without arguments when a
+                submission is added to the buffer. Defaults to None.
+            on_running ([callable], optional): Called with the message and
+                the submission of a running submission, which may be a
+                redelivery of a message this worker is evaluating or of one
+                it was evaluating before a restart. Defaults to None.
+            max_age ([float], optional): Seconds after which a buffered
+                submission is resolved again when it is taken. Defaults to
+                `PREFETCH_MAX_AGE`.
+        """
+        self.evalai = evalai
+        self.size = max(1, size)
+        self.poller = poller or AdaptivePoller()
+        self.on_ready = on_ready
+        self.on_running = on_running
+        self.max_age = max_age
+        self.condition = threading.Condition()
+        # (message, submission, fetch time) of the submissions ready to be
+        # evaluated
+        self.buffer = collections.deque()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def get(self):
+        """Take the next prefetched submission without waiting
+
+        A submission that waited longer than `max_age` is resolved again,
+        and skipped if it is no longer ready to be evaluated.
+
+        Returns:
+            [tuple]: (message, submission), or None if the buffer is empty
+        """
+        while True:
+            with self.condition:
+                if not self.buffer:
+                    return None
+                message, submission, fetched = self.buffer.popleft()
+                self.condition.notify_all()
+            if time.monotonic() - fetched < self.max_age:
+                return message, submission
+            try:
+                submission = self.evalai.get_submission_by_pk(
+                    message["body"].get("submission_pk")
+                )
+                if self.dispatch(message, submission):
+                    return message, submission
+            except Exception:
+                logger.exception("Resolving a buffered submission again failed")
+                return message, submission
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.closed or len(self.buffer) < self.size
+                )
+                if self.closed:
+                    return
+            try:
+                got_message = self.fetch()
+            except Exception:
+                REGISTRY.increment("evaluation_queue_polls_total", result="error")
+                logger.exception("Polling the submission queue failed")
+                got_message = False
+            delay = self.poller.next_delay(got_message)
+            with self.condition:
+                if self.condition.wait_for(lambda: self.closed, timeout=delay):
+                    return
+
+    def fetch(self):
+        """Fetch one message and resolve its submission
+
+        Returns:
+            [bool]: Whether the queue returned a message
+        """
+        message = self.evalai.get_message_from_sqs_queue()
+        message_body = message.get("body")
+        if not message_body:
+            REGISTRY.increment("evaluation_queue_polls_total", result="empty")
+            return False
+        REGISTRY.increment("evaluation_queue_polls_total", result="message")
+        submission = self.evalai.get_submission_by_pk(message_body.get("submission_pk"))
+        if self.dispatch(message, submission):
+            with self.condition:
+                self.buffer.append((message, submission, time.monotonic()))
+            if self.on_ready is not None:
+                self.on_ready()
+        return True
+
+    def dispatch(self, message, submission):
+        """Delete or hand on the message of a submission not ready to evaluate
+
+        Args:
+            message ([dict]): Queue message
+            submission ([dict]): Submission record of the message
+
+        Returns:
+            [bool]: Whether the submission is ready to be evaluated
+        """
+        status = submission.get("status")
+        if status in DONE_STATUSES:
+            self.evalai.delete_message_from_sqs_queue(message.get("receipt_handle"))
+            return False
+        if status == "running":
+            if self.on_running is not None:
+                self.on_running(message, submission)
+            return False
+        return True
+
+    def close(self):
+        """Stop polling, prefetched messages return to the queue later"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
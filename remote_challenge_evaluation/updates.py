@@ -0,0 +1,189 @@
+import collections
+import logging
+import threading
+import time
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Threads that send updates at the same time
+UPDATE_SENDERS = 2
+# Attempts to send an update before it is given up. Transient errors are
+# retried within an attempt by the HTTP session.
+UPDATE_ATTEMPTS = 8
+# Delay before a failed update is sent again, doubled after every attempt
+UPDATE_BACKOFF = 1.0
+UPDATE_MAX_BACKOFF = 60.0
+
+
+class UpdateQueue:
+    def __init__(
+        self,
+        evalai,
+        num_senders=UPDATE_SENDERS,
+        max_attempts=UPDATE_ATTEMPTS,
+        on_reported=None,
+    ):
+        """Outbound queue of submission updates sent in the background
+
+        Updates are queued without waiting for the API and sent by a few
+        sender threads, so the updates of several submissions are in flight
+        at once. The updates of one submission are coalesced: a final result
+        replaces a RUNNING status that has not been sent yet, since it sets
+        the status as well. The updates of one submission are sent in order.
+        A failed update is queued again to be sent after a backoff, which is
+        safe because sending the same update twice has the same effect as
+        once. No sender thread waits out the backoff, so the updates of other
+        submissions go on meanwhile.
+
+        Args:
+            evalai ([EvalAI_Interface]): Client of the EvalAI API
+            num_senders ([int], optional): Sender threads. Defaults to
+                `UPDATE_SENDERS`.
+            max_attempts ([int], optional): Attempts per update. Defaults to
+                `UPDATE_ATTEMPTS`.
+            on_reported ([callable], optional): Called with the primary key of
+                a submission once its final update is stored. Defaults to
+                None.
+        """
+        self.evalai = evalai
+        self.max_attempts = max_attempts
+        self.on_reported = on_reported
+        self.condition = threading.Condition()
+        # Submission -> its unsent updates, in the order they were queued
+        self.pending = collections.OrderedDict()
+        # Submissions whose updates are being sent
+        self.in_flight = set()
+        self.closed = False
+        self.senders = [
+            threading.Thread(target=self.send_loop, daemon=True)
+            for _ in range(num_senders)
+        ]
+        for sender in self.senders:
+            sender.start()
+
+    def update_submission_status(self, data):
+        """Queue a status update, e.g. RUNNING
+
+        Args:
+            data ([dict]): Data of `EvalAI_Interface.update_submission_status`
+        """
+        self.put(data["submission"], status=data)
+
+    def update_submission_data(self, data, receipt_handle=None):
+        """Queue the final update of a submission
+
+        Args:
+            data ([dict]): Data of `EvalAI_Interface.update_submission_data`
+            receipt_handle ([str], optional): Queue message to delete once the
+                update is sent. Defaults to None.
+        """
+        self.put(
+            data["submission"],
+            data=data,
+            receipt_handle=receipt_handle,
+            queued=time.perf_counter(),
+        )
+
+    def put(self, submission_pk, **updates):
+        with self.condition:
+            entry = self.pending.setdefault(submission_pk, {})
+            if "data" in updates:
+                entry.pop("status", None)
+            entry.update(updates)
+            self.condition.notify_all()
+
+    def next_ready(self, now):
+        """First submission with due updates that is not being sent, or None"""
+        for submission_pk, entry in self.pending.items():
+            if submission_pk not in self.in_flight and entry.get("due", 0) <= now:
+                return submission_pk
+        return None
+
+    def wait_time(self, now):
+        """Seconds until the next failed update is due, or None"""
+        due = [
+            entry["due"]
+            for submission_pk, entry in self.pending.items()
+            if submission_pk not in self.in_flight and "due" in entry
+        ]
+        return max(0, min(due) - now) if due else None
+
+    def send_loop(self):
+        while True:
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    submission_pk = self.next_ready(now)
+                    if submission_pk is not None or (self.closed and not self.pending):
+                        break
+                    self.condition.wait(self.wait_time(now))
+                if submission_pk is None:
+                    return
+                entry = self.pending.pop(submission_pk)
+                self.in_flight.add(submission_pk)
+            try:
+                self.send(submission_pk, entry)
+            except Exception:
+                self.reschedule(submission_pk, entry)
+            finally:
+                with self.condition:
+                    self.in_flight.discard(submission_pk)
+                    self.condition.notify_all()
+
+    def send(self, submission_pk, entry):
+        """Send the updates of a submission, each removed from `entry` once sent"""
+        if "status" in entry:
+            self.evalai.update_submission_status(entry["status"])
+            del entry["status"]
+        if "data" in entry:
+            self.evalai.update_submission_data(entry["data"])
+            del entry["data"]
+            REGISTRY.observe(
+                "evaluation_stage_seconds",
+                time.perf_counter() - entry["queued"],
+                stage="report",
+            )
+            if self.on_reported is not None:
+                self.on_reported(submission_pk)
+        if entry.get("receipt_handle"):
+            # The message is only deleted after the result is stored, so a
+            # lost update leaves the message to be delivered again
+            self.evalai.delete_message_from_sqs_queue(entry["receipt_handle"])
+            del entry["receipt_handle"]
+
+    def reschedule(self, submission_pk, entry):
+        """Queue the unsent updates of a failed `send` again after a backoff"""
+        attempts = entry.get("attempts", 0) + 1
+        if attempts >= self.max_attempts:
+            logger.exception(
+                "Giving up the update of submission {}".format(submission_pk)
+            )
+            return
+        delay = min(UPDATE_MAX_BACKOFF, UPDATE_BACKOFF * 2 ** (attempts - 1))
+        logger.info(
+            "Update of submission {} failed, retrying in {:.0f}s".format(
+                submission_pk, delay
+            )
+        )
+        with self.condition:
+            # Updates queued meanwhile come after the unsent ones
+            newer = self.pending.pop(submission_pk, {})
+            if "data" in newer:
+                entry.pop("status", None)
+            entry.update(newer, attempts=attempts, due=time.monotonic() + delay)
+            self.pending[submission_pk] = entry
+
+    def flush(self):
+        """Wait until every queued update is sent or given up"""
+        with self.condition:
+            self.condition.wait_for(lambda: not self.pending and not self.in_flight)
+
+    def close(self):
+        """Send the queued updates and stop the sender threads"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for sender in self.senders:
+            sender.join()
@@ -0,0 +1,367 @@
+import collections
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+
+from journal import (
+    FETCHED,
+    REPORTED,
+    SCORED,
+    Journal,
+    is_new_attempt,
+    unreported_result,
+)
+from metrics import (
+    METRICS_PORT,
+    REGISTRY,
+    peak_rss_bytes,
+    reset_peak_rss,
+    start_metrics_server,
+)
+from prefetch import PREFETCH_SIZE, Prefetcher
+from updates import UpdateQueue
+
+logger = logging.getLogger(__name__)
+
+# Submissions evaluated at the same time
+NUM_SLOTS = int(os.environ.get("EVALUATION_SLOTS", 2))
+# Address space limit of every evaluation process in MiB, 0 means no limit
+MEMORY_LIMIT_MB = int(os.environ.get("EVALUATION_MEMORY_LIMIT_MB", 0))
+
+
+def limit_memory(memory_limit_mb):
+    """Initializer of the evaluation processes that caps their memory
+
+    Every process runs one submission at a time, so this is a per-submission
+    limit. Allocations beyond it raise MemoryError inside the evaluation.
+
+    Args:
+        memory_limit_mb ([int]): Address space limit in MiB, 0 for no limit
+    """
+    if memory_limit_mb:
+        import resource
+
+        limit = memory_limit_mb << 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_evaluation(evaluate, submission):
+    """Evaluate a submission in a pool process and measure the evaluation
+
+    The time of the evaluation, less the download and validate stages that
+    `evaluate` records itself, is the score stage.
+
+    Args:
+        evaluate ([callable]): Evaluation function of the worker
+        submission ([dict]): Submission record
+
+    Returns:
+        [tuple]: (result, error, metrics) with the split results or the
+            traceback of the failure, and a snapshot of the metrics recorded
+            during the evaluation
+    """
+    REGISTRY.clear()
+    reset_peak_rss()
+    start = time.perf_counter()
+    result = error = None
+    try:
+        result = evaluate(submission)
+    except Exception:
+        error = traceback.format_exc()
+    seconds = time.perf_counter() - start
+    for stage in ("download", "validate"):
+        seconds -= REGISTRY.total("evaluation_stage_seconds", stage=stage)
+    REGISTRY.observe("evaluation_stage_seconds", max(0.0, seconds), stage="score")
+    REGISTRY.observe("evaluation_peak_rss_bytes", peak_rss_bytes())
+    return result, error, REGISTRY.snapshot()
+
+
+class SubmissionWorker:
+    def __init__(
+        self,
+        evalai,
+        evaluate,
+        num_slots=NUM_SLOTS,
+        memory_limit_mb=MEMORY_LIMIT_MB,
+        poller=None,
+        updates=None,
+        prefetch_size=PREFETCH_SIZE,
+        journal=None,
+        metrics_port=METRICS_PORT,
+    ):
+        """Evaluate queued submissions in a bounded pool of processes
+
+        Messages and their submissions are fetched ahead into a small buffer,
+        from which every free evaluation slot starts right away. Every
+        submission is marked as running, evaluated in its own
+        slot, reported as finished or failed and its message is deleted as
+        soon as it is done. Updates go through a background queue, so a slot
+        is free again as soon as its evaluation ends. The stages of every
+        submission are kept in a local journal, so after a restart a
+        redelivered submission that was already scored is only reported.
+        A message that comes back while its submission is still evaluated
+        here is dropped and its newest receipt handle is kept.
+
+        Args:
+            evalai ([EvalAI_Interface]): Client of the EvalAI API
+            evaluate ([callable]): Picklable function that takes the
+                submission record and returns the list of split results for
+                the "result" field of the submission, raising on failure
+            num_slots ([int], optional): Number of concurrent evaluations.
+                Defaults to `NUM_SLOTS`.
+            memory_limit_mb ([int], optional): Memory limit of every
+                evaluation in MiB, 0 for none. Defaults to `MEMORY_LIMIT_MB`.
+            poller ([AdaptivePoller], optional): Sleep schedule between polls
+                of the queue. Defaults to a new `AdaptivePoller`.
+            updates ([UpdateQueue], optional): Queue of the updates sent to
+                EvalAI. Defaults to a new `UpdateQueue`.
+            prefetch_size ([int], optional): Submissions fetched ahead of a
+                free slot. Defaults to `PREFETCH_SIZE`.
+            journal ([Journal], optional): Journal of the submission stages.
+                Defaults to a `Journal` at `JOURNAL_PATH`.
+            metrics_port ([int], optional): Port of the metrics endpoint, 0
+                for none. Defaults to `METRICS_PORT`.
+        """
+        self.evalai = evalai
+        self.evaluate = evaluate
+        self.num_slots = num_slots
+        self.memory_limit_mb = memory_limit_mb
+        self.poller = poller
+        self.prefetch_size = prefetch_size
+        self.journal = journal or Journal()
+        self.updates = updates or UpdateQueue(
+            evalai,
+            on_reported=lambda submission_pk: self.journal.record(
+                submission_pk, REPORTED
+            ),
+        )
+        self.prefetcher = None
+        self.metrics_port = metrics_port
+        # Set when an evaluation ends or a submission is prefetched
+        self.wakeup = threading.Event()
+        self.executor = None
+        # Pool of one process for the evaluations of a broken pool
+        self.isolation = None
+        # Future of every running evaluation -> its latest queue message
+        self.running = {}
+        # Future of every running evaluation -> (submission, its pool)
+        self.evaluations = {}
+        # Placeholder futures of the evaluations waiting for the isolation pool
+        self.suspects = collections.deque()
+        # Submission -> future of its running evaluation
+        self.submissions = {}
+        # (message, submission) of running submissions from the prefetch thread
+        self.redeliveries = collections.deque()
+        # (message, submission) of the submissions started here before a
+        # restart, which go before the prefetched ones
+        self.resumed = collections.deque()
+
+    def new_pool(self, max_workers):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=limit_memory,
+            initargs=(self.memory_limit_mb,),
+        )
+
+    def start_executor(self):
+        self.executor = self.new_pool(self.num_slots)
+
+    def run(self):
+        """Serve the queue forever"""
+        REGISTRY.set_function("evaluation_in_flight", lambda: len(self.running))
+        metrics_server = start_metrics_server(self.metrics_port)
+        self.start_executor()
+        self.isolation = self.new_pool(1)
+        self.prefetcher = Prefetcher(
+            self.evalai,
+            size=self.prefetch_size,
+            poller=self.poller,
+            on_ready=self.wakeup.set,
+            on_running=self.redelivered,
+        )
+        try:
+            while True:
+                # Events after the clear wake up the wait below
+                self.wakeup.clear()
+                self.collect()
+                while self.redeliveries:
+                    self.resume(*self.redeliveries.popleft())
+                while len(self.running) < self.num_slots:
+                    if self.resumed:
+                        item = self.resumed.popleft()
+                    else:
+                        item = self.prefetcher.get()
+                    if item is None:
+                        break
+                    self.start(*item)
+                self.wakeup.wait()
+        finally:
+            self.prefetcher.close()
+            self.executor.shutdown(wait=True)
+            self.isolation.shutdown(wait=True)
+            self.updates.close()
+            if metrics_server is not None:
+                metrics_server.shutdown()
+
+    def start(self, message, submission):
+        submission_pk = message["body"].get("submission_pk")
+        if self.drop_duplicate(message):
+            return
+        stages = self.journal.stages(submission_pk)
+        scored = unreported_result(stages)
+        if scored is not None:
+            # Scored before a restart, only the report is missing
+            logger.info("Submission {} was already scored".format(submission_pk))
+            self.report(message, **scored)
+            return
+        if is_new_attempt(stages):
+            # An interrupted attempt keeps its stages, e.g. the download
+            self.journal.record(submission_pk, FETCHED, submission)
+        logger.info("Starting evaluation of submission {}".format(submission_pk))
+        self.updates.update_submission_status(
+            {
+                "submission": submission_pk,
+                "job_name": "",
+                "submission_status": "RUNNING",
+            }
+        )
+        self.submit(message, submission, self.executor)
+
+    def submit(self, message, submission, executor):
+        future = executor.submit(run_evaluation, self.evaluate, submission)
+        self.running[future] = message
+        self.evaluations[future] = (submission, executor)
+        self.submissions[message["body"].get("submission_pk")] = future
+        future.add_done_callback(lambda future: self.wakeup.set())
+
+    def isolate(self, message, submission):
+        """Queue an evaluation of a broken pool for the isolation pool
+
+        It keeps its slot and stays a running submission while it waits.
+        """
+        placeholder = concurrent.futures.Future()
+        self.running[placeholder] = message
+        self.evaluations[placeholder] = (submission, None)
+        self.submissions[message["body"].get("submission_pk")] = placeholder
+        self.suspects.append(placeholder)
+
+    def redelivered(self, message, submission):
+        """Hand a message of a running submission to the main loop"""
+        self.redeliveries.append((message, submission))
+        self.wakeup.set()
+
+    def resume(self, message, submission):
+        """Handle a message of a running submission
+
+        A submission whose latest attempt here was not reported is started
+        again, and `start` reports it from the journal or evaluates it
+        again. Submissions of other workers are skipped.
+        """
+        if self.drop_duplicate(message):
+            return
+        stages = self.journal.stages(message["body"].get("submission_pk"))
+        if FETCHED in stages and REPORTED not in stages:
+            self.resumed.append((message, submission))
+
+    def drop_duplicate(self, message):
+        """Drop a message of a submission that is evaluated here
+
+        Args:
+            message ([dict]): Queue message
+
+        Returns:
+            [bool]: Whether the submission is evaluated here
+        """
+        submission_pk = message["body"].get("submission_pk")
+        future = self.submissions.get(submission_pk)
+        if future is None:
+            return False
+        # The message came back while the submission is evaluated. Only the
+        # newest receipt handle is sure to delete it.
+        logger.info(
+            "Submission {} delivered again while running, dropped".format(submission_pk)
+        )
+        self.running[future] = message
+        return True
+
+    def collect(self):
+        """Report every evaluation that has finished since the last call
+
+        A killed process breaks the whole pool and fails all of its
+        evaluations, not only the one that crashed. The pool is replaced and
+        those evaluations run again one at a time in the isolation pool,
+        where a crash can only come from the evaluation itself.
+        """
+        for future in [future for future in self.running if future.done()]:
+            message = self.running.pop(future)
+            submission, executor = self.evaluations.pop(future)
+            submission_pk = message["body"].get("submission_pk")
+            del self.submissions[submission_pk]
+            result = error = None
+            try:
+                result, error, metrics = future.result()
+                REGISTRY.merge(metrics)
+            except concurrent.futures.process.BrokenProcessPool:
+                if executor is self.isolation:
+                    self.isolation.shutdown(wait=False)
+                    self.isolation = self.new_pool(1)
+                    error = "The evaluation ran out of memory or crashed"
+                else:
+                    if executor is self.executor:
+                        self.executor.shutdown(wait=False)
+                        self.start_executor()
+                    self.isolate(message, submission)
+                    continue
+            except Exception:
+                error = traceback.format_exc()
+            REGISTRY.increment(
+                "evaluations_total", status="failed" if error else "finished"
+            )
+            self.journal.record(
+                submission_pk, SCORED, {"result": result, "error": error}
+            )
+            self.report(message, result=result, error=error)
+        isolated = any(
+            executor is self.isolation for _, executor in self.evaluations.values()
+        )
+        if self.suspects and not isolated:
+            placeholder = self.suspects.popleft()
+            message = self.running.pop(placeholder)
+            submission, _ = self.evaluations.pop(placeholder)
+            logger.info(
+                "Evaluating submission {} again on its own after a broken "
+                "pool".format(message["body"].get("submission_pk"))
+            )
+            self.submit(message, submission, self.isolation)
+
+    def report(self, message, result=None, error=None):
+        """Queue the outcome of an evaluation and the deletion of its message
+
+        Args:
+            message ([dict]): Queue message of the submission
+            result ([list], optional): Split results of a finished evaluation
+            error ([str], optional): Error of a failed evaluation
+        """
+        message_body = message["body"]
+        submission_data = {
+            "challenge_phase": message_body.get("phase_pk"),
+            "submission": message_body.get("submission_pk"),
+            "stdout": "",
+            "stderr": error or "",
+            "submission_status": "FAILED" if error else "FINISHED",
+            "metadata": "",
+        }
+        if not error:
+            submission_data["result"] = json.dumps(result)
+        logger.info(
+            "Submission {} {}".format(
+                message_body.get("submission_pk"), submission_data["submission_status"]
+            )
+        )
+        self.updates.update_submission_data(
+            submission_data, receipt_handle=message.get("receipt_handle")
+        )
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The remote worker modules import each other as top-level modules
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "remote_challenge_evaluation",
+    ),
+)
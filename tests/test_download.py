@@ -0,0 +1,131 @@
+import hashlib
+import http.server
+import os
+import re
+import threading
+
+import pytest
+import requests
+
+import download
+from download import Download
+
+DATA = bytes(range(256)) * 1024
+CHUNK_SIZE = 16 << 10
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set by the tests: whether to honour Range, and how many of the next
+    # responses end after half of their body
+    honour_range = True
+    content_range_on_416 = True
+    drops = 0
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append(self.headers.get("Range"))
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range") or "")
+        if match and Handler.honour_range:
+            start = int(match.group(1))
+            if start >= len(DATA):
+                self.send_response(416)
+                if Handler.content_range_on_416:
+                    self.send_header("Content-Range", "bytes */{}".format(len(DATA)))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                "bytes {}-{}/{}".format(start, len(DATA) - 1, len(DATA)),
+            )
+        else:
+            start = 0
+            self.send_response(200)
+        body = DATA[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if Handler.drops:
+            Handler.drops -= 1
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    Handler.honour_range = True
+    Handler.content_range_on_416 = True
+    Handler.drops = 0
+    Handler.requests = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}/submission".format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(download, "DOWNLOAD_BACKOFF", 0)
+
+
+def fetch(url, path, **kwargs):
+    with requests.Session() as session:
+        return (
+            Download(session, url, str(path), chunk_size=CHUNK_SIZE, **kwargs)
+            .start()
+            .wait()
+        )
+
+
+def test_resumes_after_a_dropped_connection(url, tmp_path):
+    Handler.drops = 1
+    path = fetch(url, tmp_path / "submission")
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert Handler.requests == [None, "bytes={}-".format(len(DATA) // 2)]
+    assert not os.path.exists(path + ".part")
+
+
+def test_skips_the_written_bytes_when_the_server_ignores_range(url, tmp_path):
+    Handler.honour_range = False
+    (tmp_path / "submission.part").write_bytes(DATA[:1000])
+    path = fetch(url, tmp_path / "submission")
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_complete_part_file_is_kept_on_416(url, tmp_path):
+    (tmp_path / "submission.part").write_bytes(DATA)
+    sha256 = hashlib.sha256(DATA).hexdigest()
+    path = fetch(url, tmp_path / "submission", sha256=sha256)
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert Handler.requests == ["bytes={}-".format(len(DATA))]
+
+
+@pytest.mark.parametrize(
+    "extra, content_range",
+    [(b"stale", True), (b"", False)],
+    ids=["larger part file", "no Content-Range"],
+)
+def test_416_without_a_matching_size_fails(url, tmp_path, extra, content_range):
+    Handler.content_range_on_416 = content_range
+    (tmp_path / "submission.part").write_bytes(DATA + extra)
+    with pytest.raises(ValueError, match="refused the range"):
+        fetch(url, tmp_path / "submission")
+    assert not os.path.exists(tmp_path / "submission")
+
+
+def test_sha256_mismatch_fails_and_removes_the_part_file(url, tmp_path):
+    with pytest.raises(ValueError, match="SHA-256"):
+        fetch(url, tmp_path / "submission", sha256="0" * 64)
+    assert not os.path.exists(tmp_path / "submission")
+    assert not os.path.exists(tmp_path / "submission.part")
@@ -0,0 +1,139 @@
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from async_worker import AsyncSubmissionWorker
+from journal import FETCHED, REPORTED, SCORED, Journal
+from worker import SubmissionWorker
+
+MESSAGE = {"body": {"submission_pk": 1, "phase_pk": 2}, "receipt_handle": "r1"}
+SUBMISSION = {"id": 1, "status": "submitted"}
+
+
+class Evaluator:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, submission):
+        self.calls += 1
+        return [{"split": "test_split", "accuracies": {"Total": self.calls}}]
+
+
+class Updates:
+    """Stand-in of `UpdateQueue` and of the async EvalAI client"""
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.sent = []
+
+    def update_submission_status(self, data):
+        self.sent.append(data["submission_status"])
+
+    def update_submission_data(self, data, receipt_handle=None):
+        self.sent.append((data["submission_status"], data.get("result")))
+        self.journal.record(data["submission"], REPORTED)
+
+
+class AsyncUpdates(Updates):
+    async def update_submission_status(self, data):
+        super().update_submission_status(data)
+
+    async def update_submission_data(self, data):
+        super().update_submission_data(data)
+
+    async def delete_message_from_sqs_queue(self, receipt_handle):
+        pass
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / "journal.sqlite3"))
+    yield journal
+    journal.close()
+
+
+def run_sync(journal, evaluate):
+    updates = Updates(journal)
+    worker = SubmissionWorker(
+        None, evaluate, updates=updates, journal=journal, metrics_port=0
+    )
+    with concurrent.futures.ThreadPoolExecutor(1) as worker.executor:
+        worker.start(MESSAGE, SUBMISSION)
+        concurrent.futures.wait(list(worker.running))
+        worker.collect()
+    return updates.sent
+
+
+def run_async(journal, evaluate):
+    updates = AsyncUpdates(journal)
+    worker = AsyncSubmissionWorker(updates, evaluate, journal=journal, metrics_port=0)
+
+    async def process():
+        worker.slots = asyncio.Semaphore(1)
+        await worker.slots.acquire()
+        worker.messages[1] = MESSAGE
+        await worker.process(MESSAGE, SUBMISSION)
+
+    with concurrent.futures.ThreadPoolExecutor(1) as worker.executor:
+        asyncio.run(process())
+    return updates.sent
+
+
+@pytest.fixture(params=[run_sync, run_async], ids=["thread", "asyncio"])
+def run(request):
+    return request.param
+
+
+def test_reported_submission_is_evaluated_again(run, journal):
+    evaluate = Evaluator()
+    run(journal, evaluate)
+    sent = run(journal, evaluate)
+    assert evaluate.calls == 2
+    assert sent[0] == "RUNNING"
+    assert "2" in sent[1][1]
+
+
+def test_unreported_result_is_reported_from_the_journal(run, journal):
+    journal.record(1, FETCHED, SUBMISSION)
+    journal.record(1, SCORED, {"result": [{"split": "s"}], "error": None})
+    evaluate = Evaluator()
+    sent = run(journal, evaluate)
+    assert evaluate.calls == 0
+    assert sent == [("FINISHED", '[{"split": "s"}]')]
+
+
+def test_unreported_error_is_evaluated_again(run, journal):
+    journal.record(1, FETCHED, SUBMISSION)
+    journal.record(1, SCORED, {"result": None, "error": "Timeout"})
+    evaluate = Evaluator()
+    sent = run(journal, evaluate)
+    assert evaluate.calls == 1
+    assert sent[-1][0] == "FINISHED"
+
+
+class FailingJournal(Journal):
+    def record(self, submission_pk, stage, artifact=None):
+        if stage == SCORED:
+            raise OSError("disk full")
+        super().record(submission_pk, stage, artifact)
+
+
+def test_failing_journal_does_not_keep_the_message_in_flight(tmp_path):
+    journal = FailingJournal(str(tmp_path / "journal.sqlite3"))
+    worker = AsyncSubmissionWorker(
+        AsyncUpdates(journal), Evaluator(), journal=journal, metrics_port=0
+    )
+
+    async def process():
+        worker.slots = asyncio.Semaphore(1)
+        await worker.slots.acquire()
+        worker.messages[1] = MESSAGE
+        with pytest.raises(OSError):
+            await worker.process(MESSAGE, SUBMISSION)
+
+    with concurrent.futures.ThreadPoolExecutor(1) as worker.executor:
+        asyncio.run(process())
+    journal.close()
+    assert worker.messages == {}
+    assert not worker.slots.locked()
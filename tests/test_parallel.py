@@ -0,0 +1,100 @@
+import functools
+import random
+
+import pytest
+
+from evaluation_script import cache, delta, parallel
+from evaluation_script.cache import ResultCache
+from evaluation_script.index import load_index
+from evaluation_script.main import score_splits
+
+TAGS = ["O", "O", "O", "B-Library", "I-Library", "B-Language", "I-Language"]
+SPLITS = ["train_split", "test_split"]
+
+
+def corpus(rng, num_sentences=120):
+    return [
+        [rng.choice(TAGS) for _ in range(rng.randint(1, 10))]
+        for _ in range(num_sentences)
+    ]
+
+
+def conll(sentences, with_splits):
+    lines = []
+    for number, tags in enumerate(sentences):
+        if with_splits and number % 40 == 0:
+            lines.append("# split = {}\n".format(SPLITS[number // 40 % 2]))
+        lines.extend("t{}\t{}\n".format(i, tag) for i, tag in enumerate(tags))
+        lines.append("\n")
+    return "".join(lines)
+
+
+@pytest.fixture
+def files(tmp_path):
+    rng = random.Random(0)
+    gold = corpus(rng)
+    pred = [[rng.choice(TAGS) if rng.random() < 0.3 else t for t in s] for s in gold]
+    gold_file = tmp_path / "gold.txt"
+    gold_file.write_text(conll(gold, with_splits=True))
+    pred_file = tmp_path / "pred.txt"
+    pred_file.write_text(conll(pred, with_splits=False))
+    gold_index = load_index(str(gold_file), str(tmp_path / "index"))
+    return gold_index, str(pred_file)
+
+
+@pytest.fixture(autouse=True)
+def small_pieces(monkeypatch):
+    # Several shards and delta blocks even for a small file
+    monkeypatch.setattr(
+        parallel, "plan_shards", functools.partial(parallel.plan_shards, shard_size=64)
+    )
+    monkeypatch.setattr(
+        delta, "iter_chunks", functools.partial(delta.iter_chunks, chunk_sentences=7)
+    )
+
+
+@pytest.mark.parametrize("bootstrap_samples", [0, 20])
+def test_sharded_and_delta_scores_equal_serial(files, tmp_path, bootstrap_samples):
+    gold_index, pred_file = files
+    splits = [None] + SPLITS
+    serial = score_splits(
+        gold_index, pred_file, splits, bootstrap_samples=bootstrap_samples
+    )
+    assert len(parallel.plan_shards(pred_file, 3)) > 3
+    sharded = score_splits(
+        gold_index, pred_file, splits, 3, bootstrap_samples=bootstrap_samples
+    )
+    result_cache = ResultCache(str(tmp_path / "cache"))
+    cached = [
+        score_splits(
+            gold_index,
+            pred_file,
+            splits,
+            cache=result_cache,
+            bootstrap_samples=bootstrap_samples,
+        )
+        for _ in range(2)
+    ]
+    assert sharded == serial
+    assert cached == [serial, serial]
+
+
+def test_delta_rescores_only_changed_blocks(files, tmp_path):
+    gold_index, pred_file = files
+    result_cache = ResultCache(str(tmp_path / "cache"))
+    score_splits(gold_index, pred_file, SPLITS, cache=result_cache)
+    with open(pred_file) as f:
+        text = f.read()
+    # Change the tag of the first token only
+    first_line, rest = text.split("\n", 1)
+    token, tag = first_line.split("\t")
+    changed = "O" if tag != "O" else "B-Library"
+    with open(pred_file, "w") as f:
+        f.write("{}\t{}\n{}".format(token, changed, rest))
+
+    requests = dict(cache.REQUESTS)
+    cached = score_splits(gold_index, pred_file, SPLITS, cache=result_cache)
+    misses = cache.REQUESTS["miss"] - requests.get("miss", 0)
+    hits = cache.REQUESTS["hit"] - requests.get("hit", 0)
+    assert misses == 1 and hits > 1
+    assert cached == score_splits(gold_index, pred_file, SPLITS)
@@ -0,0 +1,149 @@
+import collections
+import io
+import random
+
+import numpy as np
+import pytest
+
+from evaluation_script import scorer
+from evaluation_script.conll import read_sentences
+from evaluation_script.index import load_index
+from evaluation_script.scorer import score_submission, score_tag_ids
+
+TYPES = ["Library", "Language", "Class"]
+
+
+def reference_spans(tags):
+    """Entity spans of one sentence by the chunk rules of conlleval"""
+    spans = set()
+    start = entity_type = None
+    for position, tag in enumerate(tags + ["O"]):
+        prefix, _, tag_type = tag.partition("-")
+        if start is not None and (prefix != "I" or tag_type != entity_type):
+            spans.add((start, position - 1, entity_type))
+            start = None
+        if prefix == "B" or (prefix == "I" and start is None):
+            start, entity_type = position, tag_type
+    return spans
+
+
+def reference_counts(gold_sentences, pred_sentences):
+    counts = collections.defaultdict(lambda: [0, 0, 0])
+    for gold_tags, pred_tags in zip(gold_sentences, pred_sentences):
+        gold, pred = reference_spans(gold_tags), reference_spans(pred_tags)
+        for span in gold & pred:
+            counts[span[2]][0] += 1
+        for span in pred - gold:
+            counts[span[2]][1] += 1
+        for span in gold - pred:
+            counts[span[2]][2] += 1
+    return {entity_type: tuple(count) for entity_type, count in counts.items()}
+
+
+def conll(sentences, separator="\n"):
+    return "".join(
+        "".join("t{}\t{}\n".format(i, tag) for i, tag in enumerate(tags)) + separator
+        for tags in sentences
+    )
+
+
+def gold_index_of(tmp_path, gold_sentences):
+    gold = tmp_path / "gold.txt"
+    gold.write_text(conll(gold_sentences))
+    return load_index(str(gold), str(tmp_path / "index"))
+
+
+def scored_counts(tmp_path, gold_sentences, pred_sentences, separator="\n"):
+    gold_index = gold_index_of(tmp_path, gold_sentences)
+    sentences = read_sentences(io.StringIO(conll(pred_sentences, separator)))
+    return type_counts(*score_submission(gold_index, sentences))
+
+
+def type_counts(counts, vocabulary):
+    counts = counts.sum(axis=0)
+    return {
+        entity_type: tuple(int(count) for count in counts[type_id])
+        for type_id, entity_type in enumerate(vocabulary.entity_types)
+        if counts[type_id].any()
+    }
+
+
+GOLD = [
+    ["B-Library", "I-Library", "O", "B-Language"],
+    ["O", "B-Class", "I-Class"],
+    ["O", "O", "O"],
+    ["B-Library", "I-Library", "I-Library"],
+    ["B-Language"],
+]
+CASES = {
+    "identical": GOLD,
+    # I- after O opens an entity
+    "inside after outside": [
+        ["O", "I-Library", "O", "I-Language"],
+        ["O", "I-Class", "I-Class"],
+        ["I-Class", "O", "O"],
+        ["O", "I-Library", "I-Library"],
+        ["I-Language"],
+    ],
+    # A type change inside a span ends it and opens a new one
+    "type change": [
+        ["B-Library", "I-Language", "O", "B-Language"],
+        ["O", "B-Class", "I-Library"],
+        ["O", "O", "O"],
+        ["B-Library", "I-Library", "I-Class"],
+        ["B-Class"],
+    ],
+    # Spans that run to the end of a sentence, or across its boundary
+    "sentence end": [
+        ["B-Library", "I-Library", "O", "I-Language"],
+        ["I-Language", "B-Class", "I-Class"],
+        ["O", "O", "B-Class"],
+        ["I-Class", "I-Library", "I-Library"],
+        ["I-Library"],
+    ],
+    # Sentences without any entity
+    "no entities": [["O"] * len(tags) for tags in GOLD],
+}
+
+
+@pytest.mark.parametrize("pred", CASES.values(), ids=list(CASES))
+def test_counts_match_conlleval(tmp_path, pred):
+    assert scored_counts(tmp_path, GOLD, pred) == reference_counts(GOLD, pred)
+
+
+def test_extra_blank_lines_do_not_add_sentences(tmp_path):
+    pred = CASES["type change"]
+    assert scored_counts(tmp_path, GOLD, pred, "\n\n\n") == reference_counts(GOLD, pred)
+
+
+def random_corpus():
+    rng = random.Random(0)
+    tags = ["O", "O", "O"] + [
+        prefix + "-" + entity_type for prefix in "BI" for entity_type in TYPES
+    ]
+
+    def sentence():
+        return [rng.choice(tags) for _ in range(rng.randint(1, 12))]
+
+    gold = [sentence() for _ in range(200)]
+    pred = [
+        [rng.choice(tags) if rng.random() < 0.3 else tag for tag in sentence]
+        for sentence in gold
+    ]
+    return gold, pred
+
+
+def test_random_tags_across_batches_match_conlleval(tmp_path, monkeypatch):
+    monkeypatch.setattr(scorer, "BATCH_SIZE", 7)
+    gold, pred = random_corpus()
+    assert scored_counts(tmp_path, gold, pred) == reference_counts(gold, pred)
+
+
+def test_tag_ids_match_conlleval(tmp_path, monkeypatch):
+    monkeypatch.setattr(scorer, "BATCH_SIZE", 7)
+    gold, pred = random_corpus()
+    gold_index = gold_index_of(tmp_path, gold)
+    names = sorted({tag for tags in pred for tag in tags})
+    tag_ids = np.array([names.index(tag) for tags in pred for tag in tags])
+    counts = type_counts(*score_tag_ids(gold_index, tag_ids, names))
+    assert counts == reference_counts(gold, pred)
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+import updates
+from updates import UpdateQueue
+
+
+class EvalAI:
+    """Stand-in of `EvalAI_Interface` that fails the first calls of some submissions"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def call(self, name, submission_pk):
+        with self.lock:
+            self.calls.append((name, submission_pk))
+            if self.failures.get(submission_pk, 0) > 0:
+                self.failures[submission_pk] -= 1
+                raise ConnectionError("EvalAI is down")
+
+    def update_submission_status(self, data):
+        self.call("status", data["submission"])
+
+    def update_submission_data(self, data):
+        self.call("data", data["submission"])
+
+    def delete_message_from_sqs_queue(self, receipt_handle):
+        self.call("delete", int(receipt_handle))
+
+
+def final_update(submission_pk):
+    return {"submission": submission_pk, "submission_status": "FINISHED"}
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(updates, "UPDATE_BACKOFF", 0.2)
+
+
+def test_failed_update_does_not_hold_up_other_submissions():
+    evalai = EvalAI({1: 1})
+    reported = []
+    queue = UpdateQueue(evalai, num_senders=1, on_reported=reported.append)
+    queue.update_submission_data(final_update(1), receipt_handle="1")
+    queue.update_submission_data(final_update(2), receipt_handle="2")
+    queue.close()
+    assert evalai.calls == [
+        ("data", 1),
+        ("data", 2),
+        ("delete", 2),
+        ("data", 1),
+        ("delete", 1),
+    ]
+    assert reported == [2, 1]
+
+
+def test_only_unsent_updates_are_sent_again():
+    evalai = EvalAI({})
+    queue = UpdateQueue(evalai, num_senders=1)
+    evalai.failures[1] = 1
+    # The delete fails after the result is stored
+    evalai.update_submission_data = lambda data: evalai.calls.append(("data", 1))
+    queue.update_submission_data(final_update(1), receipt_handle="1")
+    queue.close()
+    assert evalai.calls == [("data", 1), ("delete", 1), ("delete", 1)]
+
+
+def test_update_is_given_up_after_the_last_attempt():
+    evalai = EvalAI({1: 10})
+    reported = []
+    queue = UpdateQueue(evalai, max_attempts=2, on_reported=reported.append)
+    queue.update_submission_status({"submission": 1, "submission_status": "RUNNING"})
+    queue.close()
+    assert evalai.calls == [("status", 1), ("status", 1)]
+    assert reported == []
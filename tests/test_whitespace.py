@@ -0,0 +1,66 @@
+import io
+
+import pytest
+
+from evaluation_script.conll import read_sentences
+from evaluation_script.delta import iter_chunks
+from evaluation_script.index import load_index
+from evaluation_script.main import score_splits
+from evaluation_script.validation import validate_submission
+
+# A token with a no-break space, common in StackOverflow text
+GOLD = (
+    "a\xa0b\tB-Library\n"
+    "jQuery\tB-Library\n"
+    "\n"
+    "on\tO\n"
+    "Ubuntu\tB-Operating_System\n"
+    "\n"
+    "Java\tB-Language\n"
+)
+# A line of only a no-break space is a token line, not a sentence separator
+NO_BREAK_LINE = "a\tO\n\xa0\nb\tO\n\nc\tO\n"
+# A lone carriage return separates columns, it does not end the line
+CARRIAGE_RETURN = GOLD.replace("jQuery\t", "jQuery\r")
+
+
+@pytest.fixture
+def gold(tmp_path):
+    path = tmp_path / "gold.txt"
+    path.write_bytes(GOLD.encode("utf-8"))
+    return path
+
+
+def test_unicode_whitespace_is_part_of_the_token():
+    sentences = list(read_sentences(io.StringIO(GOLD)))
+    assert [tokens for _, tokens, _, _ in sentences] == [
+        ["a\xa0b", "jQuery"],
+        ["on", "Ubuntu"],
+        ["Java"],
+    ]
+    sentences = list(read_sentences(io.StringIO(NO_BREAK_LINE)))
+    assert [tokens for _, tokens, _, _ in sentences] == [["a", "\xa0", "b"], ["c"]]
+    sentences = list(read_sentences(io.StringIO(CARRIAGE_RETURN, newline="\n")))
+    assert [tags for _, _, tags, _ in sentences][0] == ["B-Library", "B-Library"]
+
+
+@pytest.mark.parametrize("text", [GOLD, NO_BREAK_LINE, CARRIAGE_RETURN])
+def test_chunks_count_the_sentences_of_the_parser(text):
+    chunks = list(iter_chunks(io.BytesIO(text.encode("utf-8")), chunk_sentences=1))
+    assert len(chunks) == len(list(read_sentences(io.StringIO(text, newline="\n"))))
+
+
+def test_identical_submission_is_valid_and_scores_full_marks(gold, tmp_path):
+    gold_index = load_index(str(gold), str(tmp_path / "index"))
+    validate_submission(gold_index, str(gold))
+    (result,) = score_splits(gold_index, str(gold), [None], bootstrap_samples=0)
+    assert result["metrics"]["Total"] == 100.0
+
+
+def test_carriage_return_is_validated_and_scored_alike(gold, tmp_path):
+    gold_index = load_index(str(gold), str(tmp_path / "index"))
+    submission = tmp_path / "submission.txt"
+    submission.write_bytes(CARRIAGE_RETURN.encode("utf-8"))
+    validate_submission(gold_index, str(submission))
+    (result,) = score_splits(gold_index, str(submission), [None], bootstrap_samples=0)
+    assert result["metrics"]["Total"] == 100.0
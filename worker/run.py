@@ -15,10 +15,10 @@ def run():
 
     challenge_id = 1
     challenge_phase = "test"  # Add the challenge phase codename to be tested
-    annotation_file_path = "{}/annotations/test_annotations_testsplit.json".format(
+    annotation_file_path = "{}/annotations/test_annotations_testsplit.txt".format(
         current_working_directory
     )  # Add the test annotation file path
-    user_submission_file_path = "{}/submission.json".format(
+    user_submission_file_path = "{}/submission.txt".format(
         current_working_directory
     )  # Add the sample submission file path
 